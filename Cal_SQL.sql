@@ -1,4 +1,4 @@
-CREATE VIEW calendar_events AS
+CREATE OR REPLACE VIEW calendar_events AS
 
 SELECT	d1.title,
 		d1.start_ts AS start_date,
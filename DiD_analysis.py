@@ -1,17 +1,19 @@
 """
 Load your productivity_table view from Postgres, deduplicate rare multiple-event person-days,
 create a pre/post policy indicator, and fit a Negative Binomial GLM with day-of-week controls.
+
+Importing this module does nothing but define functions; run it (or call main()) for the analysis.
+statsmodels, patsy, matplotlib and the database driver are imported only by the steps that use them.
+
+    python DiD_analysis.py                      # fit + show the plot
+    python DiD_analysis.py --headless           # write plots to PLOT_DIR instead of opening windows
+    python DiD_analysis.py --resampling --sweep --panel
 """
 
 # ============================
 # User inputs (edit these)
 # ============================
-DB_HOST = "localhost"
-DB_PORT = 5432
-DB_NAME = "lab_analytics"
-DB_USER = "postgres"
-DB_PASSWORD = "***" # <-- CHANGE ME
-
+# Database connection settings live in lab_config.py
 VIEW_NAME = "productivity_table"   # your SQL VIEW
 DATE_MIN = "2020-01-01"
 DATE_MAX = "2026-01-01"
@@ -27,76 +29,69 @@ DEDUP_RULE = "max_duration"  # options: "max_duration", "first", "last"
 want_export = False
 OUTPUT_CSV = r"C:\Users\Jacob\Dropbox\Python\Lab Analytics\outputs\productivity_model_clean.csv"
 
+# Plots are written here in headless mode
+PLOT_DIR = r"C:\Users\Jacob\Dropbox\Python\Lab Analytics\outputs"
+
+# Worker processes for the sweep and resampling (None = one per core). The A/B/C and panel fits
+# always run in this process: a pool costs more to start than those fits take.
+N_JOBS = None
+
+# Resampling inference for the policy effect (wild cluster bootstrap + cluster permutation test)
+RUN_RESAMPLING = False
+N_BOOT = 9999
+N_PERM = 4999
+RESAMPLING_SEED = 20250101
+
+# Placebo-date / window sensitivity sweep for Model A
+RUN_SWEEP = False
+SWEEP_STEP_DAYS = 7        # spacing of candidate breakpoints
+SWEEP_MIN_DAYS = 90        # minimum pre and post span around a breakpoint
+SWEEP_WINDOWS = [(DATE_MIN, DATE_MAX), ("2022-01-01", DATE_MAX), ("2023-01-01", DATE_MAX)]
+SWEEP_OUTPUT_CSV = r"C:\Users\Jacob\Dropbox\Python\Lab Analytics\outputs\policy_date_sweep.csv"
+
+# Balanced person x day panel (includes unused days) built from the files + calendar_events views
+RUN_PANEL = False
+
 # ============================
 # Imports
 # ============================
+import argparse
 import os
+import re
 import numpy as np
 import pandas as pd
-import psycopg2
-import statsmodels.api as sm
-import statsmodels.formula.api as smf
-from statsmodels.stats.sandwich_covariance import cov_cluster
-from patsy import dmatrices
-import matplotlib.pyplot as plt
-import re
+
 
 # ============================
 # Load from Postgres
 # ============================
-conn = psycopg2.connect(
-    host=DB_HOST, port=DB_PORT, dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD
-)
-
-query = f"""
-SELECT *
-FROM {VIEW_NAME}
-WHERE date >= %s AND date < %s
-"""
-df = pd.read_sql(query, conn, params=[DATE_MIN, DATE_MAX])
-
-print("Rows loaded:", len(df))
-print("Min date loaded:", pd.to_datetime(df["date"]).min())
-print("Max date loaded:", pd.to_datetime(df["date"]).max())
-
-# Count rows by year
-tmp = pd.to_datetime(df["date"], errors="coerce")
-print(tmp.dt.year.value_counts().sort_index())
+def load_productivity(date_min=DATE_MIN, date_max=DATE_MAX, view_name=VIEW_NAME):
+    from lab_config import get_conn
+
+    conn = get_conn()
+    try:
+        query = f"""
+        SELECT *
+        FROM {view_name}
+        WHERE date >= %s AND date < %s
+        """
+        df = pd.read_sql(query, conn, params=[date_min, date_max])
+    finally:
+        conn.close()
+
+    print("Rows loaded:", len(df))
+    print("Min date loaded:", pd.to_datetime(df["date"]).min())
+    print("Max date loaded:", pd.to_datetime(df["date"]).max())
+
+    # Count rows by year
+    tmp = pd.to_datetime(df["date"], errors="coerce")
+    print(tmp.dt.year.value_counts().sort_index())
+    return df
 
-conn.close()
 
 # ============================
 # Basic cleaning / types
 # ============================
-# Columns list:
-# event_title, date, day_of_week, event_start_date, event_end_date, event_duration,
-# lead_time_hr, title_length, mentions_wavelength_lightsource, mother_folder, file_count
-df["date"] = pd.to_datetime(df["date"]).dt.date
-df["mother_folder"] = df["mother_folder"].astype(str)
-df["file_count"] = pd.to_numeric(df["file_count"], errors="coerce").fillna(0).astype(int)
-
-# event_duration might be NULL; ensure numeric
-if "event_duration" in df.columns:
-    df["event_duration"] = pd.to_numeric(df["event_duration"], errors="coerce").fillna(0.0)
-else:
-    df["event_duration"] = 0.0
-
-# Derive day-of-week from date (holistic control, consistent with file-day)
-df["day_of_week"] = pd.to_datetime(df["date"]).dt.day_name()
-
-# Policy indicator
-policy_date = pd.to_datetime(POLICY_CHANGE_DATE).date()
-df["is_post_policy"] = (df["date"] >= policy_date).astype(int)
-
-# Lead time: remove non-physical negatives (common with edits/imports) without clipping
-if "lead_time_hr" in df.columns:
-    df["lead_time_hr"] = pd.to_numeric(df["lead_time_hr"], errors="coerce")
-    df["lead_time_hr_clean"] = df["lead_time_hr"].where(df["lead_time_hr"] >= 0, np.nan)
-    med = df["lead_time_hr_clean"].median()
-    df["lead_time_hr_clean"] = df["lead_time_hr_clean"].fillna(med if np.isfinite(med) else 0.0)
-else:
-    df["lead_time_hr_clean"] = 0.0
-
 # Title length
 def semantic_title_length(s):
     if not isinstance(s, str):
@@ -107,200 +102,314 @@ def semantic_title_length(s):
     payload = " ".join(parts[1:])   # drop first word
     return len(payload)
 
-df["title_len"] = df["event_title"].apply(semantic_title_length).astype(float)
-
+def clean_productivity(df, policy_change_date=POLICY_CHANGE_DATE, dedup_rule=DEDUP_RULE):
+    # Columns list:
+    # event_title, date, day_of_week, event_start_date, event_end_date, event_duration,
+    # lead_time_hr, title_length, mentions_wavelength_lightsource, mother_folder, file_count
+    df = df.copy()
+    df["date"] = pd.to_datetime(df["date"]).dt.date
+    df["mother_folder"] = df["mother_folder"].astype(str)
+    df["file_count"] = pd.to_numeric(df["file_count"], errors="coerce").fillna(0).astype(int)
+
+    # event_duration might be NULL; ensure numeric
+    if "event_duration" in df.columns:
+        df["event_duration"] = pd.to_numeric(df["event_duration"], errors="coerce").fillna(0.0)
+    else:
+        df["event_duration"] = 0.0
+
+    # Derive day-of-week from date (holistic control, consistent with file-day)
+    df["day_of_week"] = pd.to_datetime(df["date"]).dt.day_name()
+
+    # Policy indicator
+    policy_date = pd.to_datetime(policy_change_date).date()
+    df["is_post_policy"] = (df["date"] >= policy_date).astype(int)
+
+    # Lead time: remove non-physical negatives (common with edits/imports) without clipping
+    if "lead_time_hr" in df.columns:
+        df["lead_time_hr"] = pd.to_numeric(df["lead_time_hr"], errors="coerce")
+        df["lead_time_hr_clean"] = df["lead_time_hr"].where(df["lead_time_hr"] >= 0, np.nan)
+        med = df["lead_time_hr_clean"].median()
+        df["lead_time_hr_clean"] = df["lead_time_hr_clean"].fillna(med if np.isfinite(med) else 0.0)
+    else:
+        df["lead_time_hr_clean"] = 0.0
+
+    df["title_len"] = df["event_title"].apply(semantic_title_length).astype(float)
+
+    # Mentions flag
+    if "mentions_wavelength_lightsource" in df.columns:
+        df["mentions_wave"] = pd.to_numeric(df["mentions_wavelength_lightsource"], errors="coerce").fillna(0).astype(int)
+    else:
+        df["mentions_wave"] = 0
+
+    # ============================
+    # Deduplicate rare multi-event days (person-day)
+    # ============================
+    df = df.rename(columns={"mother_folder": "person", "file_count": "files"})
+
+    if dedup_rule == "max_duration":
+        df = df.sort_values(["person", "date", "event_duration"], ascending=[True, True, False])
+        df = df.drop_duplicates(subset=["person", "date"], keep="first")
+    elif dedup_rule == "first":
+        df = df.sort_values(["person", "date", "event_start_date"], ascending=[True, True, True])
+        df = df.drop_duplicates(subset=["person", "date"], keep="first")
+    elif dedup_rule == "last":
+        df = df.sort_values(["person", "date", "event_start_date"], ascending=[True, True, True])
+        df = df.drop_duplicates(subset=["person", "date"], keep="last")
+    else:
+        raise ValueError("DEDUP_RULE must be one of: max_duration, first, last")
+
+    return df
 
-# Mentions flag
-if "mentions_wavelength_lightsource" in df.columns:
-    df["mentions_wave"] = pd.to_numeric(df["mentions_wavelength_lightsource"], errors="coerce").fillna(0).astype(int)
-else:
-    df["mentions_wave"] = 0
-
-# ============================
-# Deduplicate rare multi-event days (person-day)
-# ============================
-df = df.rename(columns={"mother_folder": "person", "file_count": "files"})
-
-if DEDUP_RULE == "max_duration":
-    df = df.sort_values(["person", "date", "event_duration"], ascending=[True, True, False])
-    df = df.drop_duplicates(subset=["person", "date"], keep="first")
-elif DEDUP_RULE == "first":
-    df = df.sort_values(["person", "date", "event_start_date"], ascending=[True, True, True])
-    df = df.drop_duplicates(subset=["person", "date"], keep="first")
-elif DEDUP_RULE == "last":
-    df = df.sort_values(["person", "date", "event_start_date"], ascending=[True, True, True])
-    df = df.drop_duplicates(subset=["person", "date"], keep="last")
-else:
-    raise ValueError("DEDUP_RULE must be one of: max_duration, first, last")
 
 # ============================
 # Export cleaned dataset (optional)
 # ============================
-if want_export == True:
-    os.makedirs(os.path.dirname(OUTPUT_CSV), exist_ok=True)
-    df.to_csv(OUTPUT_CSV, index=False)
+def export_clean(df, path=OUTPUT_CSV):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    df.to_csv(path, index=False)
+
 
 # ============================
 # Sanity checks
 # ============================
+def print_sanity_checks(df):
+    print("Rows after dedup:", len(df))
+    print("Unique person-days:", df[["person", "date"]].drop_duplicates().shape[0])
+    print("Mean files pre:", df.loc[df["is_post_policy"] == 0, "files"].mean())
+    print("Mean files post:", df.loc[df["is_post_policy"] == 1, "files"].mean())
+    print("Var(files) / Mean(files):", (df["files"].var(ddof=1) / max(df["files"].mean(), 1e-9)))
+    print("Zero-files and One-file fraction:", (df["files"] < 2).mean())
 
-print("Rows after dedup:", len(df))
-print("Unique person-days:", df[["person", "date"]].drop_duplicates().shape[0])
-print("Mean files pre:", df.loc[df["is_post_policy"] == 0, "files"].mean())
-print("Mean files post:", df.loc[df["is_post_policy"] == 1, "files"].mean())
-print("Var(files) / Mean(files):", (df["files"].var(ddof=1) / max(df["files"].mean(), 1e-9)))
-print("Zero-files and One-file fraction:", (df["files"] < 2).mean())
 
 # ============================
-# Fit function
+# Fit Models A, B and C
 # ============================
-def fit_nb_cluster(formula, df, group_col="person", maxiter=500, method="lbfgs", disp=True):
-    y, X = dmatrices(formula, data=df, return_type="dataframe")
-    y = y.iloc[:, 0]
+def fit_policy_models(df, n_jobs=1, disp=True):
+    # One shared design matrix; C is warm-started from its nested model, A and B run side by side
+    from DiD_fitting import MODEL_FORMULAS, build_design, fit_models
 
-    res = sm.NegativeBinomial(y, X).fit(method=method, maxiter=maxiter, disp=disp)
+    design = build_design(df, MODEL_FORMULAS, group_col="person")
+    fits = fit_models(design, n_jobs=n_jobs, method="lbfgs", maxiter=500, disp=disp)
 
-    # cluster-robust covariance (version-safe)
-    res.cov_params_default = cov_cluster(res, df[group_col])
-    return res
+    # Model A — True policy effect; does the policy improve productivity?
+    print(fits["A"].summary())
+    # Model B — Documentation design effect; does the title length matter?
+    print(fits["B"].summary())
+    # Model C — Mediation decomposition; how much does title length mediate the policy effect?
+    print(fits["C"].summary())
+    return design, fits
 
 
 # ============================
-# Model A — True policy effect; does the policy improve productivity?
+# Convert coefficients to percent effects (A, B, C separately)
 # ============================
-# Day-of-week included holistically via C(day_of_week)
-# 'C' indicates categorical variable
-formula_policy = """
-files ~
-    is_post_policy
-  + event_duration
-  + lead_time_hr_clean
-  + mentions_wave
-  + C(day_of_week)
-"""
+def coef_to_pct_table(res, label):
+    coef = pd.Series(res.params, index=res.model.exog_names)
+    pct = (np.exp(coef) - 1.0) * 100.0
+    out = pd.DataFrame({"coef": coef, "pct_change_%": pct})
+    out["model"] = label
+    return out.sort_values("pct_change_%", ascending=False)
+
+def print_effects(fits):
+    effects_A = coef_to_pct_table(fits["A"], "A_total_policy")
+    effects_B = coef_to_pct_table(fits["B"], "B_title_effect")
+    effects_C = coef_to_pct_table(fits["C"], "C_direct_policy")
+
+    print("\n--- Multiplicative effects (% change), Model A ---")
+    print(effects_A)
+
+    print("\n--- Multiplicative effects (% change), Model B ---")
+    print(effects_B)
+
+    print("\n--- Multiplicative effects (% change), Model C ---")
+    print(effects_C)
 
-yA, XA = dmatrices(formula_policy, data=df, return_type="dataframe")
-yA = yA.iloc[:, 0]
-res_policy = fit_nb_cluster(formula_policy, df, group_col="person", method="lbfgs", maxiter=500, disp=True)
-print(res_policy.summary())
 
 # ============================
-# Model B — Documentation design effect; does the title length matter?
+# Policy effect decomposition: total vs direct (A vs C)
 # ============================
-formula_title = """
-files ~
-    title_len
-  + event_duration
-  + lead_time_hr_clean
-  + mentions_wave
-  + C(day_of_week)
-"""
+def policy_decomposition(fits):
+    betaA = float(fits["A"].params["is_post_policy"])
+    betaC = float(fits["C"].params["is_post_policy"])
+
+    total_pct = (np.exp(betaA) - 1.0) * 100.0
+    direct_pct = (np.exp(betaC) - 1.0) * 100.0
 
-yB, XB = dmatrices(formula_title, data=df, return_type="dataframe")
-yB = yB.iloc[:, 0]
-res_title = fit_nb_cluster(formula_title, df, group_col="person", method="lbfgs", maxiter=500, disp=True)
-print(res_title.summary())
+    print("\nPolicy effect at baseline covariates (reference weekday, interactions excluded):")
+    print(f"  Total policy effect (Model A):  {total_pct:.2f}%")
+    print(f"  Direct policy effect (Model C): {direct_pct:.2f}%")
+
+    # Approx mediated share on log scale (more stable than percent space)
+    # mediated_share = (betaA - betaC) / betaA   (guard against betaA≈0)
+    if abs(betaA) > 1e-9:
+        mediated_share = (betaA - betaC) / betaA
+        print(f"  Approx mediated share via title_len: {mediated_share:.3f}")
+    else:
+        mediated_share = None
+        print("  Approx mediated share: undefined (total policy effect ~ 0)")
+    return betaA, betaC, mediated_share
 
 
 # ============================
-# Model C — Mediation decomposition; how much does title length mediate the policy effect?
+# Resampling inference (optional): few clusters make cov_cluster SEs fragile
 # ============================
-formula_mediation = """
-files ~
-    is_post_policy
-  + title_len
-  + event_duration
-  + lead_time_hr_clean
-  + mentions_wave
-  + C(day_of_week)
-"""
+def run_resampling(design, fits, n_boot=N_BOOT, n_perm=N_PERM, seed=RESAMPLING_SEED, n_jobs=N_JOBS):
+    from DiD_inference import wild_cluster_bootstrap, summarize_bootstrap, cluster_permutation_test
+
+    observed, draws = wild_cluster_bootstrap(design, fits, labels=("A", "C"), n_reps=n_boot, seed=seed, n_jobs=n_jobs)
+    print(f"\n--- Wild cluster restricted score bootstrap ({n_boot} reps, {len(design['clusters'])} clusters) ---")
+    print(summarize_bootstrap(observed, draws, fits))
+
+    observed, perm_draws, perm_p = cluster_permutation_test(design, fits, label="A", n_reps=n_perm, seed=seed, n_jobs=n_jobs)
+    print(f"\n--- Cluster permutation test, Model A ({n_perm} reps) ---")
+    print(f"  is_post_policy (alpha fixed): {observed:.4f}   permutation p-value: {perm_p:.4f}")
+    return draws, perm_draws, perm_p
 
-yC, XC = dmatrices(formula_mediation, data=df, return_type="dataframe")
-yC = yC.iloc[:, 0]
-res_mediation = fit_nb_cluster(formula_mediation, df, group_col="person", method="lbfgs", maxiter=500, disp=True)
-print(res_mediation.summary())
 
 # ============================
-# Convert coefficients to percent effects (A, B, C separately)
+# Placebo-date / window sweep (optional)
 # ============================
-def coef_to_pct_table(res, label):
-    coef = pd.Series(res.params, index=res.model.exog_names)
-    pct = (np.exp(coef) - 1.0) * 100.0
-    out = pd.DataFrame({"coef": coef, "pct_change_%": pct})
-    out["model"] = label
-    return out.sort_values("pct_change_%", ascending=False)
+def run_sweep(design, res_policy, output_csv=SWEEP_OUTPUT_CSV, n_jobs=N_JOBS, plot_path=None):
+    # plot_path=None opens the plot in a window (see plot_weekly)
+    from DiD_sweep import breakpoint_grid, sweep_policy_dates, plot_sweep
 
-effects_A = coef_to_pct_table(res_policy, "A_total_policy")
-effects_B = coef_to_pct_table(res_title, "B_title_effect")
-effects_C = coef_to_pct_table(res_mediation, "C_direct_policy")
+    breakpoints = breakpoint_grid(DATE_MIN, DATE_MAX, step_days=SWEEP_STEP_DAYS, min_days=SWEEP_MIN_DAYS)
+    sweep = sweep_policy_dates(design, res_policy, breakpoints, windows=SWEEP_WINDOWS, label="A", n_jobs=n_jobs)
+    print(f"\n--- Policy date sweep: {len(sweep)} fits ---")
+    print(sweep.loc[sweep["coef"].notna()].sort_values("z", ascending=False).head(10))
 
-print("\n--- Multiplicative effects (% change), Model A ---")
-print(effects_A)
+    os.makedirs(os.path.dirname(output_csv), exist_ok=True)
+    sweep.to_csv(output_csv, index=False)
+    plot_sweep(sweep, policy_date=POLICY_CHANGE_DATE, path=plot_path)
+    return sweep
 
-print("\n--- Multiplicative effects (% change), Model B ---")
-print(effects_B)
-
-print("\n--- Multiplicative effects (% change), Model C ---")
-print(effects_C)
 
 # ============================
-# Policy effect decomposition: total vs direct (A vs C)
+# Balanced person x day panel (optional): interrupted time series including unused days
 # ============================
-betaA = float(res_policy.params[list(XA.columns).index("is_post_policy")] if hasattr(res_policy.params, "__len__") else res_policy.params["is_post_policy"])
-betaC = float(res_mediation.params[list(XC.columns).index("is_post_policy")] if hasattr(res_mediation.params, "__len__") else res_mediation.params["is_post_policy"])
+def run_panel(n_jobs=1):
+    from lab_config import get_conn
+    from DiD_fitting import build_design, fit_models
+    from DiD_panel import PANEL_FORMULAS, load_panel_sources, build_panel, panel_frame
+
+    conn = get_conn()
+    try:
+        files_src, calendar_src = load_panel_sources(conn, DATE_MIN, DATE_MAX)
+    finally:
+        conn.close()
 
-total_pct = (np.exp(betaA) - 1.0) * 100.0
-direct_pct = (np.exp(betaC) - 1.0) * 100.0
+    panel = build_panel(files_src, calendar_src, DATE_MIN, DATE_MAX)
+    panel_df = panel_frame(panel, POLICY_CHANGE_DATE)
+    print(f"\nPanel: {len(panel['persons'])} people x {len(panel['days'])} days, booked days: {panel_df['booked'].sum()}")
 
-print("\nPolicy effect at baseline covariates (reference weekday, interactions excluded):")
-print(f"  Total policy effect (Model A):  {total_pct:.2f}%")
-print(f"  Direct policy effect (Model C): {direct_pct:.2f}%")
+    panel_design = build_design(panel_df, PANEL_FORMULAS, group_col="person")
+    res_panel = fit_models(panel_design, n_jobs=n_jobs, method="lbfgs", maxiter=500, disp=True)["ITS"]
+    print(res_panel.summary())
+    return res_panel
+
+
+# ============================
+# Plot output (shared with DiD_sweep.plot_sweep)
+# ============================
+def get_pyplot(path=None):
+    # path=None opens windows; otherwise switch to the non-interactive backend (headless)
+    import matplotlib
+    if path is not None:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+def show_or_save(fig, path=None):
+    # path=None shows the figure; otherwise it is written to path and closed
+    import matplotlib.pyplot as plt
+    if path is None:
+        plt.show()
+    else:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        fig.savefig(path, dpi=150)
+        plt.close(fig)
+    return fig
 
-# Approx mediated share on log scale (more stable than percent space)
-# mediated_share = (betaA - betaC) / betaA   (guard against betaA≈0)
-if abs(betaA) > 1e-9:
-    mediated_share = (betaA - betaC) / betaA
-    print(f"  Approx mediated share via title_len: {mediated_share:.3f}")
-else:
-    print("  Approx mediated share: undefined (total policy effect ~ 0)")
 
 # ============================
 # Plot: weekly mean bars + 30-day moving average
 # ============================
+def plot_weekly(df, policy_change_date=POLICY_CHANGE_DATE, path=None):
+    plt = get_pyplot(path)
+
+    # Seattle-local dates
+    dt = pd.to_datetime(df["date"], utc=True, errors="coerce").dt.tz_convert("America/Los_Angeles")
+    date_local = dt.dt.date
+    week = dt.dt.to_period("W-MON").dt.start_time
+
+    # Weekly mean bars
+    wk = (
+        df["files"].groupby(week)
+          .mean()
+          .rename_axis("week")
+          .reset_index(name="mean_files")
+    )
+
+    # 30-day moving average (daily resolution)
+    daily = (
+        df["files"].groupby(date_local)
+          .mean()
+          .rename_axis("date")
+          .reset_index(name="mean_files")
+    )
+
+    daily["date"] = pd.to_datetime(daily["date"])
+    daily = daily.sort_values("date")
+    daily["ma30"] = daily["mean_files"].rolling(30, min_periods=10).mean()
+
+    # Plot
+    fig = plt.figure(figsize=(11,4))
+    plt.bar(wk["week"], wk["mean_files"], width=5, alpha=0.35)
+    plt.plot(daily["date"], daily["ma30"], linewidth=2)
+    plt.axvline(pd.to_datetime(policy_change_date), linestyle="--")
+    plt.xlabel("Week / Date")
+    plt.xlim(pd.to_datetime('2020'), pd.to_datetime('2026'))
+    plt.ylabel("Files per day (weekly average)")
+    plt.title("Weekly productivity with 30-day moving average ignoring unused days")
+    plt.tight_layout()
+    return show_or_save(fig, path)
 
-# Seattle-local dates
-dt = pd.to_datetime(df["date"], utc=True, errors="coerce").dt.tz_convert("America/Los_Angeles")
-df["_date_local"] = dt.dt.date
-df["_week"] = dt.dt.to_period("W-MON").dt.start_time
-
-# Weekly mean bars
-wk = (
-    df.groupby("_week")["files"]
-      .mean()
-      .reset_index()
-      .rename(columns={"_week": "week", "files": "mean_files"})
-)
-
-# 30-day moving average (daily resolution)
-daily = (
-    df.groupby("_date_local")["files"]
-      .mean()
-      .reset_index()
-      .rename(columns={"_date_local": "date", "files": "mean_files"})
-)
-
-daily["date"] = pd.to_datetime(daily["date"])
-daily = daily.sort_values("date")
-daily["ma30"] = daily["mean_files"].rolling(30, min_periods=10).mean()
-
-# Plot
-plt.figure(figsize=(11,4))
-plt.bar(wk["week"], wk["mean_files"], width=5, alpha=0.35)
-plt.plot(daily["date"], daily["ma30"], linewidth=2)
-plt.axvline(pd.to_datetime(POLICY_CHANGE_DATE), linestyle="--")
-plt.xlabel("Week / Date")
-plt.xlim(pd.to_datetime('2020'), pd.to_datetime('2026'))
-plt.ylabel("Files per day (weekly average)")
-plt.title("Weekly productivity with 30-day moving average ignoring unused days")
-plt.tight_layout()
-plt.show()
+
+# ============================
+# Orchestrate
+# ============================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Interrupted time series / mediation models for the policy change.")
+    parser.add_argument("--headless", action="store_true", help="write plots to --plot-dir instead of showing them")
+    parser.add_argument("--plot-dir", default=PLOT_DIR)
+    parser.add_argument("--export", action="store_true", default=want_export, help="write the cleaned dataset to OUTPUT_CSV")
+    parser.add_argument("--resampling", action="store_true", default=RUN_RESAMPLING)
+    parser.add_argument("--sweep", action="store_true", default=RUN_SWEEP)
+    parser.add_argument("--panel", action="store_true", default=RUN_PANEL)
+    parser.add_argument("--jobs", type=int, default=N_JOBS, help="worker processes for --sweep / --resampling (default or 0 = one per core)")
+    args = parser.parse_args(argv)
+
+    df = clean_productivity(load_productivity())
+    if args.export:
+        export_clean(df)
+    print_sanity_checks(df)
+
+    design, fits = fit_policy_models(df)
+    n_jobs = args.jobs or None
+    print_effects(fits)
+    policy_decomposition(fits)
+
+    if args.resampling:
+        run_resampling(design, fits, n_jobs=n_jobs)
+    if args.sweep:
+        sweep_plot = os.path.join(args.plot_dir, "policy_date_sweep.png") if args.headless else None
+        run_sweep(design, fits["A"], n_jobs=n_jobs, plot_path=sweep_plot)
+    if args.panel:
+        run_panel()
+
+    plot_path = os.path.join(args.plot_dir, "Productivity_weekly_30DMA.png") if args.headless else None
+    plot_weekly(df, path=plot_path)
+    return design, fits
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Shared design-matrix and warm-started Negative Binomial fitting engine for the DiD models.
+
+The union of every model's terms is built into one patsy design matrix; each formula is then
+a column subset of it. Nested models are warm-started from the fit of the largest model they
+contain, the rest from a Poisson fit, and independent models are fit in worker processes.
+L-BFGS can report convergence from a warm start while still short of the optimum, so every fit
+is checked against its score and polished with Newton (or refit from statsmodels' default start).
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import statsmodels.api as sm
+from statsmodels.stats.sandwich_covariance import cov_cluster
+from patsy import dmatrices, ModelDesc
+
+# A fit is accepted when every score component is below this (log-likelihood units per parameter)
+SCORE_TOL = 1e-3
+NEWTON_MAXITER = 50
+
+# ============================
+# Model formulas
+# ============================
+# Model A — True policy effect; does the policy improve productivity?
+# Day-of-week included holistically via C(day_of_week)
+# 'C' indicates categorical variable
+FORMULA_POLICY = """
+files ~
+    is_post_policy
+  + event_duration
+  + lead_time_hr_clean
+  + mentions_wave
+  + C(day_of_week)
+"""
+
+# Model B — Documentation design effect; does the title length matter?
+FORMULA_TITLE = """
+files ~
+    title_len
+  + event_duration
+  + lead_time_hr_clean
+  + mentions_wave
+  + C(day_of_week)
+"""
+
+# Model C — Mediation decomposition; how much does title length mediate the policy effect?
+FORMULA_MEDIATION = """
+files ~
+    is_post_policy
+  + title_len
+  + event_duration
+  + lead_time_hr_clean
+  + mentions_wave
+  + C(day_of_week)
+"""
+
+MODEL_FORMULAS = {
+    "A": FORMULA_POLICY,
+    "B": FORMULA_TITLE,
+    "C": FORMULA_MEDIATION,
+}
+
+
+# ============================
+# Design matrix (built once)
+# ============================
+def _term_names(formula):
+    desc = ModelDesc.from_formula(formula)
+    lhs = [t.name() for t in desc.lhs_termlist]
+    rhs = [t.name() for t in desc.rhs_termlist]
+    return lhs, rhs
+
+def _union_formula(formulas):
+    # Merge the term lists keeping each formula's own order (a new term goes in front of the
+    # next term it precedes), so every subset comes out in the column order patsy would give
+    # that formula on its own.
+    lhs = None
+    rhs = []
+    for formula in formulas:
+        f_lhs, f_rhs = _term_names(formula)
+        if lhs is None:
+            lhs = f_lhs
+        elif f_lhs != lhs:
+            raise ValueError("All formulas must share the same response")
+        for i, name in enumerate(f_rhs):
+            if name in rhs:
+                continue
+            later = [rhs.index(n) for n in f_rhs[i + 1:] if n in rhs]
+            rhs.insert(min(later) if later else len(rhs), name)
+    rhs = [n for n in rhs if n != "Intercept"]
+    return f"{' + '.join(lhs)} ~ {' + '.join(rhs)}"
+
+def build_design(df, formulas=None, group_col="person", date_col="date"):
+    """
+    Build the full covariate matrix once and record each formula's column subset.
+
+    Rows with a missing value in any model's variables are dropped (patsy's default),
+    so all models are fit on the same rows.
+    """
+    if formulas is None:
+        formulas = MODEL_FORMULAS
+
+    y, X = dmatrices(_union_formula(formulas.values()), data=df, return_type="dataframe")
+
+    slices = X.design_info.term_name_slices
+    columns = {}
+    for label, formula in formulas.items():
+        _, rhs = _term_names(formula)
+        missing = [n for n in rhs if n not in slices]
+        if missing:
+            raise ValueError(f"Model {label}: terms not in the shared design: {missing}")
+        cols = []
+        for name, sl in slices.items():  # full-design order
+            if name in rhs:
+                cols.extend(X.columns[sl])
+        columns[label] = cols
+
+    groups = df.loc[X.index, group_col].to_numpy()
+    clusters, group_codes = np.unique(groups, return_inverse=True)
+
+    design = {
+        "y": y.iloc[:, 0],
+        "X": X,
+        "columns": columns,
+        "index": X.index,
+        "groups": group_codes,
+        "clusters": clusters,
+    }
+    if date_col is not None and date_col in df.columns:
+        design["dates"] = pd.to_datetime(df.loc[X.index, date_col]).to_numpy().astype("datetime64[D]")
+    return design
+
+
+# ============================
+# Start values
+# ============================
+def poisson_start_params(y, X, maxiter=100):
+    # Poisson coefficients + moment estimate of the NB2 dispersion (same as statsmodels' default)
+    res_poi = sm.Poisson(y, X).fit(method="newton", maxiter=maxiter, disp=False)
+    mu = res_poi.predict()
+    resid = np.asarray(y) - mu
+    alpha = ((resid ** 2 / mu - 1) / mu).sum() / res_poi.df_resid
+    return np.append(np.asarray(res_poi.params), max(0.05, alpha))
+
+def nested_start_params(parent_res, parent_cols, cols):
+    # Parent coefficients for shared columns, 0 for the extra columns, parent's alpha last
+    parent = pd.Series(np.asarray(parent_res.params)[:-1], index=parent_cols)
+    start = parent.reindex(cols).fillna(0.0).to_numpy()
+    return np.append(start, np.asarray(parent_res.params)[-1])
+
+
+# ============================
+# Fit
+# ============================
+def max_abs_score(res):
+    score = res.model.score(np.asarray(res.params))
+    return float(np.abs(score).max()) if np.all(np.isfinite(score)) else np.inf
+
+def fit_nb_matrix(y, X, groups, start_params=None, maxiter=500, method="lbfgs", disp=False):
+    model = sm.NegativeBinomial(y, X)
+    if start_params is None:
+        start_params = poisson_start_params(y, X)
+
+    # mle_retvals["converged"] is not enough: L-BFGS can stop after one step from a good start
+    res = model.fit(start_params=start_params, method=method, maxiter=maxiter, disp=disp)
+    if max_abs_score(res) > SCORE_TOL:
+        res = model.fit(start_params=np.asarray(res.params), method="newton", maxiter=NEWTON_MAXITER, disp=disp)
+    if max_abs_score(res) > SCORE_TOL:
+        res = model.fit(method=method, maxiter=maxiter, disp=disp)    # statsmodels' own start
+
+    # cluster-robust covariance (version-safe)
+    res.cov_params_default = cov_cluster(res, groups)
+    return res
+
+def _unpickled(res):
+    # NegativeBinomial comes back from pickle with _transparams=True, which makes llf and
+    # summary() read alpha on the log scale; fit() leaves it False.
+    res.model._transparams = False
+    return res
+
+def _fit_waves(columns):
+    # Each wave holds models whose largest nested sub-model (if any) is in an earlier wave
+    parents = {}
+    for label, cols in columns.items():
+        nested = [other for other, o_cols in columns.items()
+                  if other != label and set(o_cols) < set(cols)]
+        parents[label] = max(nested, key=lambda o: len(columns[o])) if nested else None
+
+    waves, done = [], set()
+    while len(done) < len(columns):
+        wave = [label for label in columns
+                if label not in done and (parents[label] is None or parents[label] in done)]
+        waves.append(wave)
+        done.update(wave)
+    return waves, parents
+
+def fit_models(design, labels=None, n_jobs=None, maxiter=500, method="lbfgs", disp=False):
+    """
+    Fit the NB models in `design` (all of them by default) and return {label: results}.
+
+    Results carry the cluster-robust covariance as `cov_params_default`, exactly as
+    `fit_nb_cluster` did. n_jobs=1 fits in this process; None uses one worker per core.
+    """
+    if labels is None:
+        labels = list(design["columns"])
+    columns = {label: design["columns"][label] for label in labels}
+    waves, parents = _fit_waves(columns)
+
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    n_jobs = max(1, min(n_jobs, max(len(w) for w in waves)))
+
+    results = {}
+    pool = ProcessPoolExecutor(max_workers=n_jobs) if n_jobs > 1 else None
+    try:
+        for wave in waves:
+            jobs = {}
+            for label in wave:
+                cols = columns[label]
+                parent = parents[label]
+                start = None
+                if parent is not None:
+                    start = nested_start_params(results[parent], columns[parent], cols)
+
+                args = (design["y"], design["X"][cols], design["groups"], start, maxiter, method, disp)
+                jobs[label] = pool.submit(fit_nb_matrix, *args) if pool else args
+
+            for label, job in jobs.items():
+                results[label] = _unpickled(job.result()) if pool else fit_nb_matrix(*job)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    return {label: results[label] for label in labels}
@@ -0,0 +1,238 @@
+"""
+Resampling inference for the policy effect: wild cluster bootstrap and cluster permutation test.
+
+With only a handful of people, cov_cluster SEs are fragile. Both procedures here reuse the shared
+design from DiD_fitting and the fitted models as warm starts, so a replicate costs a few matrix
+products instead of a full sm.NegativeBinomial(...).fit. The bootstrap p-values impose the null
+and studentize the score, as Kline & Santos recommend for few clusters. Replicates are split into
+fixed-size chunks with one seed per chunk, so results depend only on the seed, not on the number
+of workers.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from DiD_fitting import fit_nb_matrix
+
+CHUNK_SIZE = 100           # replicates per worker task (fixed so results don't depend on n_jobs)
+NEWTON_MAXITER = 25        # Fisher-scoring iterations per permutation refit
+NEWTON_TOL = 1e-8
+
+
+# ============================
+# Chunked, seeded parallel map
+# ============================
+# Read-only state for worker tasks, set once per process by the pool initializer (DiD_sweep uses it too)
+WORKER = {}
+
+def init_worker(state):
+    WORKER.clear()
+    WORKER.update(state)
+
+def _run_chunks(func, state, n_reps, seed, n_jobs):
+    sizes = [CHUNK_SIZE] * (n_reps // CHUNK_SIZE)
+    if n_reps % CHUNK_SIZE:
+        sizes.append(n_reps % CHUNK_SIZE)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    n_jobs = max(1, min(n_jobs, len(sizes)))
+
+    if n_jobs == 1:
+        init_worker(state)
+        parts = [func(n, s) for n, s in zip(sizes, seeds)]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=init_worker, initargs=(state,)) as pool:
+            parts = list(pool.map(func, sizes, seeds))
+    return np.concatenate(parts, axis=0)
+
+
+# ============================
+# Wild cluster (score) bootstrap
+# ============================
+def cluster_weights(rng, n_reps, n_clusters, kind="webb"):
+    # Rademacher only has 2^G distinct draws; Webb's 6-point weights are better with few clusters
+    if kind == "rademacher":
+        return rng.choice(np.array([-1.0, 1.0]), size=(n_reps, n_clusters))
+    if kind == "webb":
+        pts = np.sqrt(np.array([0.5, 1.0, 1.5]))
+        return rng.choice(np.concatenate([-pts, pts]), size=(n_reps, n_clusters))
+    raise ValueError("kind must be one of: webb, rademacher")
+
+def _cluster_scores(model, params, groups, n_clusters):
+    # Per-cluster score sums (G x k) and the Hessian at params
+    score_obs = model.score_obs(params)
+    S = np.zeros((n_clusters, score_obs.shape[1]))
+    np.add.at(S, groups, score_obs)
+    return S, model.hessian(params)
+
+def restricted_params(design, res, coef="is_post_policy"):
+    # Refit with `coef` fixed at 0 (column dropped), warm-started from the unrestricted fit;
+    # returned in the unrestricted parameter layout with 0 at `coef`
+    names = list(res.model.exog_names)
+    j = names.index(coef)
+    params = np.asarray(res.params)
+    keep = [n for n in names[:-1] if n != coef]       # exog_names ends with alpha
+    res0 = fit_nb_matrix(design["y"], design["X"][keep], design["groups"], start_params=np.delete(params, j))
+    return np.insert(np.asarray(res0.params), j, 0.0)
+
+def efficient_cluster_scores(S, H, j):
+    # Score for parameter j with the nuisance parameters partialled out, one value per cluster
+    rest = np.delete(np.arange(H.shape[0]), j)
+    proj = np.linalg.solve(H[np.ix_(rest, rest)], H[rest, j])
+    return S[:, j] - S[:, rest] @ proj
+
+def _bootstrap_chunk(n, seed):
+    w = WORKER
+    rng = np.random.default_rng(seed)
+    W = cluster_weights(rng, n, w["n_clusters"], w["kind"])
+
+    # Studentized score statistic with the null imposed: sum_g w_g s_g / sqrt(sum_g w_g^2 s_g^2)
+    out = [(W @ s) / np.sqrt((W ** 2) @ (s ** 2)) for s in w["s_null"]]
+
+    # Joint one-step draws of the unrestricted coefficients, only for the mediated share interval
+    if w["mediation"] is not None:
+        (theta_a, S_a, row_a), (theta_c, S_c, row_c) = w["mediation"]
+        beta_a = theta_a - (W @ S_a) @ row_a
+        beta_c = theta_c - (W @ S_c) @ row_c
+        out.append((beta_a - beta_c) / beta_a)
+    return np.column_stack(out)
+
+def wild_cluster_bootstrap(design, fits, labels=("A", "C"), coef="is_post_policy",
+                           n_reps=9999, kind="webb", seed=0, n_jobs=None):
+    """
+    Wild cluster restricted score bootstrap (Kline & Santos 2012) for H0: `coef` = 0 in each
+    model in `labels`.
+
+    Each model is refit under the null and the efficient score for `coef` is bootstrapped as a
+    studentized statistic. When A and C are both present, joint one-step draws of the
+    unrestricted coefficients give the mediated share (betaA - betaC) / betaA.
+    Returns (observed, draws): the observed statistics and the bootstrap draws, with one column
+    per model plus "mediated_share".
+    """
+    n_clusters = len(design["clusters"])
+    state = {"n_clusters": n_clusters, "kind": kind, "s_null": [], "mediation": None}
+    observed = {}
+    for label in labels:
+        res = fits[label]
+        j = list(res.model.exog_names).index(coef)
+        S, H = _cluster_scores(res.model, restricted_params(design, res, coef), design["groups"], n_clusters)
+        s = efficient_cluster_scores(S, H, j)
+        state["s_null"].append(s)
+        observed[label] = s.sum() / np.sqrt((s ** 2).sum())
+
+    columns = list(labels)
+    if "A" in labels and "C" in labels:
+        mediation = []
+        for label in ("A", "C"):
+            res = fits[label]
+            params = np.asarray(res.params)
+            j = list(res.model.exog_names).index(coef)
+            S, H = _cluster_scores(res.model, params, design["groups"], n_clusters)
+            mediation.append((params[j], S, np.linalg.inv(H)[j]))
+        state["mediation"] = mediation
+        beta_a, beta_c = fits["A"].params[coef], fits["C"].params[coef]
+        observed["mediated_share"] = (beta_a - beta_c) / beta_a
+        columns.append("mediated_share")
+
+    draws = pd.DataFrame(_run_chunks(_bootstrap_chunk, state, n_reps, seed, n_jobs), columns=columns)
+    return pd.Series(observed), draws
+
+def summarize_bootstrap(observed, draws, fits, coef="is_post_policy", ci=0.95):
+    # Score-bootstrap p-values per model; percentile interval for the mediated share
+    rows = []
+    for name in draws.columns:
+        d = draws[name].to_numpy()
+        d = d[np.isfinite(d)]
+        if name == "mediated_share":
+            lo, hi = (1 - ci) / 2, 1 - (1 - ci) / 2
+            row = {
+                "estimate": observed[name],
+                "boot_se": d.std(ddof=1),
+                "ci_low": np.quantile(d, lo),
+                "ci_high": np.quantile(d, hi),
+            }
+        else:
+            res = fits[name]
+            j = list(res.params.index).index(coef)
+            est = float(res.params[coef])
+            row = {
+                "estimate": est,
+                "cluster_se": float(np.sqrt(res.cov_params_default[j, j])),
+                "score_stat": observed[name],
+                "pvalue": (1 + np.sum(np.abs(d) >= abs(observed[name]))) / (1 + len(d)),
+                "pct_change_%": (np.exp(est) - 1.0) * 100.0,
+            }
+        rows.append(pd.Series(row, name=name))
+    return pd.DataFrame(rows)
+
+
+# ============================
+# Cluster permutation test
+# ============================
+def _nb_refit_fixed_alpha(X, y, alpha, beta0):
+    """
+    Batched Fisher scoring for NB2 with alpha held fixed.
+
+    X is (B, n, k) — one design per replicate — and beta0 (B, k) the warm starts.
+    """
+    beta = beta0.copy()
+    for _ in range(NEWTON_MAXITER):
+        mu = np.exp(np.einsum("bnk,bk->bn", X, beta))
+        score = np.einsum("bnk,bn->bk", X, (y - mu) / (1.0 + alpha * mu))
+        info = np.matmul(X.transpose(0, 2, 1) * (mu / (1.0 + alpha * mu))[:, None, :], X)
+        step = np.linalg.solve(info, score[..., None])[..., 0]
+        beta += step
+        if np.max(np.abs(step)) < NEWTON_TOL:
+            break
+    return beta
+
+def _permute_within(rng, x, blocks):
+    # Shuffle x inside each cluster, keeping every person's count of pre/post days
+    out = x.copy()
+    for idx in blocks:
+        out[idx] = rng.permutation(x[idx])
+    return out
+
+def _permutation_chunk(n, seed):
+    w = WORKER
+    rng = np.random.default_rng(seed)
+    X = np.broadcast_to(w["X"], (n,) + w["X"].shape).copy()
+    for b in range(n):
+        X[b, :, w["j"]] = _permute_within(rng, w["x"], w["blocks"])
+    beta0 = np.broadcast_to(w["beta0"], (n, len(w["beta0"])))
+    return _nb_refit_fixed_alpha(X, w["y"], w["alpha"], beta0)[:, w["j"]]
+
+def cluster_permutation_test(design, fits, label="A", coef="is_post_policy",
+                             n_reps=4999, seed=0, n_jobs=None):
+    """
+    Permutation test for `coef` in model `label`, permuting the policy labels within each person.
+
+    Every replicate — and the observed statistic — is a Fisher-scoring refit with alpha fixed at the
+    full-sample estimate, warm-started from that fit with the policy coefficient set to 0.
+    Returns (observed coefficient, permutation draws, two-sided p-value).
+    """
+    res = fits[label]
+    cols = design["columns"][label]
+    X = design["X"][cols].to_numpy(dtype=float)
+    y = design["y"].to_numpy(dtype=float)
+    j = cols.index(coef)
+
+    params = np.asarray(res.params)
+    beta0 = params[:-1].copy()
+    beta0[j] = 0.0
+    alpha = float(params[-1])
+
+    observed = _nb_refit_fixed_alpha(X[None], y, alpha, beta0[None])[0, j]
+
+    groups = design["groups"]
+    blocks = [np.flatnonzero(groups == g) for g in range(len(design["clusters"]))]
+    state = {"X": X, "y": y, "j": j, "x": X[:, j].copy(), "blocks": blocks, "alpha": alpha, "beta0": beta0}
+
+    draws = _run_chunks(_permutation_chunk, state, n_reps, seed, n_jobs)
+    pvalue = (1 + np.sum(np.abs(draws) >= abs(observed))) / (1 + len(draws))
+    return observed, draws, pvalue
@@ -0,0 +1,157 @@
+"""
+Balanced person x day panel for the interrupted time series, including unused days.
+
+productivity_table only has days where a booking matched a file folder. This builds the dense
+panel straight from the `files` and `calendar_events` views: people and days are integer-coded,
+file counts are scattered into a (person, day) array, and bookings are spread over their days with
+a difference-array sweep instead of pandas merges. panel_frame() hands the result to
+DiD_fitting.build_design().
+"""
+
+import numpy as np
+import pandas as pd
+
+# Interrupted time series on the full panel: booked days vs unused days, before vs after
+PANEL_FORMULAS = {
+    "ITS": """
+files ~
+    is_post_policy
+  + booked
+  + booked_hours
+  + C(day_of_week)
+""",
+}
+
+FILES_QUERY = """
+SELECT mother_folder, day, file_count
+FROM files
+WHERE day >= %s AND day < %s
+"""
+
+CALENDAR_QUERY = """
+SELECT title, start_date, end_date, status
+FROM calendar_events
+WHERE end_date >= %s AND start_date < %s
+"""
+
+
+# ============================
+# Load
+# ============================
+def load_panel_sources(conn, date_min, date_max):
+    files = pd.read_sql(FILES_QUERY, conn, params=[date_min, date_max])
+    calendar = pd.read_sql(CALENDAR_QUERY, conn, params=[date_min, date_max])
+    return files, calendar
+
+
+# ============================
+# Build
+# ============================
+def local_days(ts, tz):
+    # timestamptz -> local calendar day, like ::date in the Postgres session
+    return pd.to_datetime(ts, utc=True).dt.tz_convert(tz).dt.tz_localize(None).to_numpy().astype("datetime64[D]")
+
+def epoch_seconds(ts):
+    # timestamptz -> int64 seconds since the epoch (UTC)
+    return pd.to_datetime(ts, utc=True).dt.tz_localize(None).to_numpy().astype("datetime64[s]").astype(np.int64)
+
+def match_people(titles, persons):
+    # (person_code, event_index) pairs where the title contains the folder name (title ILIKE '%person%')
+    lowered = np.char.lower(titles.astype(str))
+    hits = np.stack([np.char.find(lowered, p.lower()) >= 0 for p in persons]) if len(persons) else np.zeros((0, len(titles)), bool)
+    return np.nonzero(hits)
+
+def build_panel(files, calendar, date_min, date_max, persons=None, tz="America/Los_Angeles"):
+    """
+    Dense person x day arrays over [date_min, date_max).
+
+    Returns a dict with `persons` (P,), `days` (D,) and (P, D) arrays `files`, `n_bookings`
+    and `booked_hours`. Days with no files are 0; booking spans follow Join_Cal_and_Files.sql
+    (start::date through end::date inclusive, confirmed events only). booked_hours is the part
+    of each booking that falls inside the day, so a multi-day booking is split across its days.
+    """
+    day0 = np.datetime64(pd.to_datetime(date_min).date())
+    day_end = np.datetime64(pd.to_datetime(date_max).date())
+    days = np.arange(day0, day_end, np.timedelta64(1, "D"))
+    n_days = len(days)
+
+    folders = files["mother_folder"].astype(str).to_numpy()
+    if persons is None:
+        persons = np.unique(folders)
+    persons = np.asarray(persons, dtype=object)
+    n_people = len(persons)
+
+    # Files: integer-code people and days, scatter-add counts
+    p_code = pd.Index(persons).get_indexer(folders)
+    d_ord = (pd.to_datetime(files["day"]).to_numpy().astype("datetime64[D]") - day0).astype(np.int64)
+    ok = (p_code >= 0) & (d_ord >= 0) & (d_ord < n_days)
+    file_counts = np.zeros((n_people, n_days), dtype=np.int64)
+    np.add.at(file_counts, (p_code[ok], d_ord[ok]), files["file_count"].to_numpy()[ok].astype(np.int64))
+
+    # Bookings: confirmed events matched to people, spread over their days with a difference array
+    cal = calendar.loc[calendar["status"].astype(str).str.lower() == "confirmed"]
+    start = (local_days(cal["start_date"], tz) - day0).astype(np.int64)
+    end = (local_days(cal["end_date"], tz) - day0).astype(np.int64)
+    start_s = epoch_seconds(cal["start_date"])
+    end_s = epoch_seconds(cal["end_date"])
+
+    p_idx, e_idx = match_people(cal["title"].fillna("").to_numpy(), persons)
+    s = start[e_idx]
+    e = end[e_idx]
+    inside = (e >= 0) & (s < n_days) & (e >= s)
+    p_idx, e_idx = p_idx[inside], e_idx[inside]
+    s = np.clip(s[inside], 0, n_days - 1)
+    e = np.clip(e[inside], 0, n_days - 1)
+
+    diff = np.zeros((n_people, n_days + 1), dtype=np.int64)
+    np.add.at(diff, (p_idx, s), 1)
+    np.add.at(diff, (p_idx, e + 1), -1)
+    n_bookings = np.cumsum(diff, axis=1)[:, :n_days]
+
+    # Hours: booked seconds before each local midnight, B(T) = sum_b clip(T - start_b, 0, end_b - start_b),
+    # is linear in T while a booking is running, so it is swept as (count, constant) difference
+    # arrays over the day boundaries; a day's hours are B(next midnight) - B(midnight).
+    bounds = epoch_seconds(pd.Series(np.append(days, day_end)).dt.tz_localize(tz, nonexistent="shift_forward"))
+    t0 = start_s[e_idx]
+    t1 = np.maximum(end_s[e_idx], t0)
+    k0 = np.searchsorted(bounds, t0, side="right")
+    k1 = np.searchsorted(bounds, t1, side="left")
+    running = np.zeros((n_people, n_days + 2), dtype=np.int64)
+    const = np.zeros((n_people, n_days + 2), dtype=np.int64)
+    np.add.at(running, (p_idx, k0), 1)
+    np.add.at(running, (p_idx, k1), -1)
+    np.add.at(const, (p_idx, k0), -t0)
+    np.add.at(const, (p_idx, k1), t1)
+    booked_s = np.cumsum(running, axis=1)[:, :n_days + 1] * bounds + np.cumsum(const, axis=1)[:, :n_days + 1]
+    booked_hours = np.diff(booked_s, axis=1) / 3600.0
+
+    return {
+        "persons": persons,
+        "days": days,
+        "files": file_counts,
+        "n_bookings": n_bookings,
+        "booked_hours": booked_hours,
+    }
+
+
+# ============================
+# Hand-off to the model fitting code
+# ============================
+def panel_frame(panel, policy_date):
+    # Long person-day frame with the columns PANEL_FORMULAS and build_design() expect
+    n_people, n_days = panel["files"].shape
+    days = panel["days"]
+    weekday_names = np.array(["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"])
+    weekday = (days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+
+    frame = pd.DataFrame({
+        "person": np.repeat(panel["persons"], n_days),
+        "date": np.tile(days, n_people),
+        "files": panel["files"].ravel(),
+        "n_bookings": panel["n_bookings"].ravel(),
+        "booked": (panel["n_bookings"] > 0).ravel().astype(int),
+        "booked_hours": panel["booked_hours"].ravel(),
+        "day_of_week": np.tile(weekday_names[weekday], n_people),
+        "is_post_policy": np.tile((days >= np.datetime64(pd.to_datetime(policy_date).date())).astype(int), n_people),
+    })
+    return frame
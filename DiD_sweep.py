@@ -0,0 +1,158 @@
+"""
+Placebo-date and window sensitivity sweep for the Model A policy effect.
+
+Every fit reuses the shared design from DiD_fitting: a window is a row mask on the cached
+matrix and a breakpoint only rebuilds the is_post_policy column. Fits are warm-started from
+the main Model A fit and run in worker processes.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+from DiD_fitting import fit_nb_matrix, max_abs_score, SCORE_TOL
+from DiD_inference import WORKER, init_worker
+
+POLICY_COL = "is_post_policy"
+
+
+# ============================
+# Grid
+# ============================
+def breakpoint_grid(date_min, date_max, step_days=7, min_days=90):
+    # Candidate breakpoints every step_days, leaving at least min_days of data on each side
+    first = np.datetime64(pd.to_datetime(date_min).date()) + np.timedelta64(min_days, "D")
+    last = np.datetime64(pd.to_datetime(date_max).date()) - np.timedelta64(min_days, "D")
+    return np.arange(first, last + np.timedelta64(1, "D"), np.timedelta64(step_days, "D"))
+
+def sweep_jobs(breakpoints, windows):
+    # Every (window, breakpoint) pair with the breakpoint strictly inside the window
+    jobs = []
+    for w_min, w_max in windows:
+        lo = np.datetime64(pd.to_datetime(w_min).date())
+        hi = np.datetime64(pd.to_datetime(w_max).date())
+        for bp in np.asarray(breakpoints, dtype="datetime64[D]"):
+            if lo < bp < hi:
+                jobs.append((lo, hi, bp))
+    return jobs
+
+
+# ============================
+# Worker
+# ============================
+def _fit_breakpoint(job):
+    w = WORKER
+    lo, hi, bp = job
+    dates = w["dates"]
+    mask = (dates >= lo) & (dates < hi)
+    post = (dates[mask] >= bp).astype(float)
+
+    row = {
+        "window_min": lo, "window_max": hi, "breakpoint": bp,
+        "n_obs": int(mask.sum()), "n_pre": int((post == 0).sum()), "n_post": int((post == 1).sum()),
+        "coef": np.nan, "se": np.nan, "converged": False,
+    }
+    if min(row["n_pre"], row["n_post"]) < w["min_obs"]:
+        return row
+
+    X = w["X"][mask].copy()
+    X[POLICY_COL] = post
+    # Weekday levels can be absent in short windows; drop the all-zero columns
+    keep = [c for c in X.columns if c == POLICY_COL or X[c].any()]
+    X = X[keep]
+
+    start = w["start"].reindex(keep).fillna(0.0).to_numpy()
+    start = np.append(start, w["alpha"])
+    try:
+        res = fit_nb_matrix(w["y"][mask], X, w["groups"][mask], start_params=start,
+                            maxiter=w["maxiter"], method=w["method"], disp=False)
+    except (np.linalg.LinAlgError, ValueError):
+        return row
+
+    j = keep.index(POLICY_COL)
+    row["coef"] = float(np.asarray(res.params)[j])
+    row["se"] = float(np.sqrt(np.diag(res.cov_params_default))[j])
+    row["converged"] = max_abs_score(res) <= SCORE_TOL
+    return row
+
+
+# ============================
+# Sweep
+# ============================
+def sweep_policy_dates(design, base_fit, breakpoints, windows=None, label="A",
+                       min_obs=30, n_jobs=None, maxiter=500, method="lbfgs"):
+    """
+    Refit model `label` for every breakpoint in every (date_min, date_max) window.
+
+    base_fit is the main fit of that model and provides the warm starts. Breakpoints that
+    leave fewer than min_obs rows on either side are kept in the table with NaN estimates.
+    Returns a tidy DataFrame with one row per (window, breakpoint).
+    """
+    dates = design["dates"]
+    if windows is None:
+        windows = [(dates.min(), dates.max() + np.timedelta64(1, "D"))]
+
+    cols = design["columns"][label]
+    params = np.asarray(base_fit.params)
+    state = {
+        "X": design["X"][cols],
+        "y": design["y"],
+        "groups": design["groups"],
+        "dates": dates,
+        "start": pd.Series(params[:-1], index=cols),
+        "alpha": params[-1],
+        "min_obs": min_obs,
+        "maxiter": maxiter,
+        "method": method,
+    }
+
+    jobs = sweep_jobs(breakpoints, windows)
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    n_jobs = max(1, min(n_jobs, len(jobs)))
+
+    if n_jobs == 1:
+        init_worker(state)
+        rows = [_fit_breakpoint(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=init_worker, initargs=(state,)) as pool:
+            rows = list(pool.map(_fit_breakpoint, jobs, chunksize=max(1, len(jobs) // (4 * n_jobs))))
+
+    out = pd.DataFrame(rows)
+    for c in ("window_min", "window_max", "breakpoint"):
+        out[c] = pd.to_datetime(out[c])
+    out["z"] = out["coef"] / out["se"]
+    out["pvalue"] = 2 * norm.sf(np.abs(out["z"]))
+    out["ci_low"] = out["coef"] - 1.96 * out["se"]
+    out["ci_high"] = out["coef"] + 1.96 * out["se"]
+    out["pct_change_%"] = (np.exp(out["coef"]) - 1.0) * 100.0
+    return out
+
+
+# ============================
+# Plot
+# ============================
+def plot_sweep(table, policy_date=None, path=None):
+    # path=None opens a window; otherwise the figure is written to path (headless)
+    from DiD_analysis import get_pyplot, show_or_save
+    plt = get_pyplot(path)
+
+    fig, ax = plt.subplots(figsize=(11, 4))
+    for (w_min, w_max), grp in table.groupby(["window_min", "window_max"]):
+        grp = grp.sort_values("breakpoint")
+        label = f"{w_min:%Y-%m-%d} to {w_max:%Y-%m-%d}"
+        ax.plot(grp["breakpoint"], grp["coef"], linewidth=1.5, label=label)
+        ax.fill_between(grp["breakpoint"], grp["ci_low"], grp["ci_high"], alpha=0.15)
+
+    ax.axhline(0, color="black", linewidth=0.8)
+    if policy_date is not None:
+        ax.axvline(pd.to_datetime(policy_date), linestyle="--", color="black")
+    ax.set_xlabel("Candidate policy date")
+    ax.set_ylabel("is_post_policy coefficient (log scale)")
+    ax.set_title("Model A policy effect by breakpoint (95% cluster-robust CI)")
+    ax.legend(fontsize=8)
+    fig.tight_layout()
+    return show_or_save(fig, path)
@@ -1,22 +1,25 @@
-CREATE VIEW files AS
+CREATE OR REPLACE VIEW files AS
 
 SELECT	mother_folder,
 		day,
-		file_count
+		file_count,
+		NULL::INTEGER[] AS file_bins	-- scanned before sub-day histograms existed
 FROM user_files
 
 UNION ALL 
 
 SELECT	mother_folder,
 		day,
-		file_count
+		file_count,
+		NULL::INTEGER[] AS file_bins
 FROM user_files_2025
 
 UNION ALL 
 
 SELECT	mother_folder,
 		day,
-		file_count
+		file_count,
+		file_bins
 FROM user_files_alumni
 
 ORDER BY day ASC
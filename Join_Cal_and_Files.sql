@@ -1,4 +1,4 @@
-CREATE VIEW productivity_table AS
+CREATE OR REPLACE VIEW productivity_table AS
 SELECT	cal.title AS event_title,
 		fil.day::timestamp AS date,
 		CASE	WHEN weekday = 0 THEN 'Monday'
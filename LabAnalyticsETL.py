@@ -2,34 +2,22 @@
 # User-configurable variables
 # ----------------------------
 import os                                         #access CPU
+import json                                       #resume tokens file
 from datetime import datetime, timezone           #date handling
 from typing import Dict, Any, List, Optional      #type hints
 import hmac                                       #Convert names into pseudonyms for pirivacy  
 import hashlib                                    #lock hashes requires a key for privacy
 
 import numpy as np
-import psycopg2                                   #Postgres database access
-import psycopg2.extras
+from lab_config import get_conn                   #shared Postgres connection
+from calendar_client import fetch_events, summarize_fetch_stats, CalendarFetchError, CalendarFetchErrors  #quota-aware paging + retries
 
-from googleapiclient.discovery import build       #Google Calendar API access
-from googleapiclient.errors import HttpError      #Google Calendar API error handling
-
-from google.oauth2.credentials import Credentials    #Google Calendar API credentials
-from google_auth_oauthlib.flow import InstalledAppFlow  #Google Calendar API OAuth2 flow
-from google.auth.transport.requests import Request  #Google Calendar API request handling
-from googleapiclient.discovery import build         #Google Calendar API access
+# Google client libraries are imported inside get_calendar_service_oauth (slow to import)
 
 from zoneinfo import ZoneInfo   
 SEATTLE_TZ = ZoneInfo("America/Los_Angeles")
 
 
-# OUTPUT DB (Postgres)
-DB_HOST = "localhost"
-DB_PORT = 5432 #default port for Postgres
-DB_NAME = "lab_analytics"
-DB_USER = "postgres"
-DB_PASSWORD = "***" # <-- CHANGE ME
-
 # Calendar extraction window (UTC ISO)
 TIME_MIN_UTC = "2020-01-01T00:00:00Z"
 TIME_MAX_UTC = "2025-12-31T23:59:59Z"
@@ -39,6 +27,9 @@ CALENDAR_IDS = [
     "dnceh1hibnlamasd3nmr955kus@group.calendar.google.com",
 ]
 
+# Page tokens of calendars whose last fetch ran out of retries; the next main() resumes from them
+RESUME_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".calendar_resume.json")
+
 # OAuth2 credentials (for Google Calendar API)
 SCOPES = ["https://www.googleapis.com/auth/calendar.readonly"]  # Read-only access to calendars
 OAUTH_CLIENT_SECRET_FILE = r"C:\Users\Jacob\Dropbox\Python\Lab Analytics\secrets\client_secret.json"     # Path to the client secret JSON file
@@ -64,30 +55,51 @@ def safe_int(x, default=0) -> int:
         return default
 
 # ----------------------------
-# Google Calendar extract (placeholder)
+# Google Calendar extract
 # ----------------------------
-def fetch_events_for_calendar(service, calendar_id: str, time_min_utc: str, time_max_utc: str):
-    events = []
-    page_token = None
-
-    while True:
-        resp = service.events().list(
-            calendarId=calendar_id,
-            timeMin=time_min_utc,
-            timeMax=time_max_utc,
-            singleEvents=True,      # expands recurring events into instances
-            showDeleted=True,       # lets you see cancellations (status='cancelled')
-            maxResults=2500,    
-            pageToken=page_token
-        ).execute()
-
-        events.extend(resp.get("items", []))
-        page_token = resp.get("nextPageToken")
-        if not page_token:
-            break
-
+def fetch_events_for_calendar(service, calendar_id: str, time_min_utc: str, time_max_utc: str, page_token: Optional[str] = None, **fetch_kwargs):
+    # Field-projected, rate-limited, retrying pager (see calendar_client.py)
+    events, stats = fetch_events(service, calendar_id, time_min_utc, time_max_utc, page_token=page_token, **fetch_kwargs)
+    print(f"{calendar_id}: {summarize_fetch_stats(stats)}")
     return events
 
+def fetch_all_calendars(service, calendar_ids: List[str], time_min_utc: str, time_max_utc: str,
+                        resume_tokens: Optional[Dict[str, str]] = None, **fetch_kwargs):
+    # Every calendar is attempted even if an earlier one fails.
+    # Returns ([(calendar_id, events)], {calendar_id: CalendarFetchError}).
+    resume_tokens = resume_tokens or {}
+    fetched, failures = [], {}
+    for cal_id in calendar_ids:
+        token = resume_tokens.get(cal_id)
+        if token:
+            print(f"{cal_id}: resuming at page token {token!r}")
+        try:
+            events = fetch_events_for_calendar(service, cal_id, time_min_utc, time_max_utc, page_token=token, **fetch_kwargs)
+        except CalendarFetchError as err:
+            # Keep what was fetched (upserts are idempotent); err.page_token is where to resume
+            print(f"{err}\n{cal_id}: {summarize_fetch_stats(err.stats)}")
+            events, failures[cal_id] = err.events, err
+        fetched.append((cal_id, events))
+    return fetched, failures
+
+def load_resume_tokens(path: str = RESUME_FILE) -> Dict[str, str]:
+    # Tokens only resume the query they came from, so a changed window starts over
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        saved = json.load(f)
+    if (saved.get("time_min"), saved.get("time_max")) != (TIME_MIN_UTC, TIME_MAX_UTC):
+        return {}
+    return saved.get("tokens", {})
+
+def save_resume_tokens(tokens: Dict[str, str], path: str = RESUME_FILE):
+    if not tokens:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"time_min": TIME_MIN_UTC, "time_max": TIME_MAX_UTC, "tokens": tokens}, f, indent=2)
+
 
 # ----------------------------
 # Transform: normalize + de-identify + features
@@ -286,11 +298,6 @@ ON CONFLICT (event_pk) DO UPDATE SET
 """
 
 
-def get_conn():
-    return psycopg2.connect(
-        host=DB_HOST, port=DB_PORT, dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD
-    )
-
 def run_ddl(conn):
     with conn.cursor() as cur:
         cur.execute(DDL)
@@ -317,6 +324,11 @@ def load_events(conn, deid_rows: List[Dict[str, Any]]):
 
 
 def get_calendar_service_oauth():
+    from googleapiclient.discovery import build         #Google Calendar API access
+    from google.oauth2.credentials import Credentials    #Google Calendar API credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow  #Google Calendar API OAuth2 flow
+    from google.auth.transport.requests import Request  #Google Calendar API request handling
+
     creds = None
 
     if os.path.exists(OAUTH_TOKEN_FILE):
@@ -341,13 +353,14 @@ def get_calendar_service_oauth():
 # ----------------------------
 # Orchestrate
 # ----------------------------
-def main():
+def main(resume_tokens: Optional[Dict[str, str]] = None, resume_file: str = RESUME_FILE):
+    # resume_tokens: {calendar_id: page_token}; by default the ones a failed run left in resume_file
+    if resume_tokens is None:
+        resume_tokens = load_resume_tokens(resume_file)
+
     service = get_calendar_service_oauth()  # or get_calendar_service_service_account()
-    all_deid = []
-    for cal_id in CALENDAR_IDS:
-        events = fetch_events_for_calendar(service, cal_id, TIME_MIN_UTC, TIME_MAX_UTC)
-        for e in events:
-            all_deid.append(deid_event(e, cal_id, HMAC_SECRET))
+    fetched, failures = fetch_all_calendars(service, CALENDAR_IDS, TIME_MIN_UTC, TIME_MAX_UTC, resume_tokens)
+    all_deid = [deid_event(e, cal_id, HMAC_SECRET) for cal_id, events in fetched for e in events]
 
     conn = get_conn()
     try:
@@ -356,6 +369,10 @@ def main():
     finally:
         conn.close()
 
+    save_resume_tokens({cal_id: err.page_token for cal_id, err in failures.items() if err.page_token}, resume_file)
+    if failures:
+        raise CalendarFetchErrors(failures)
+
 if __name__ == "__main__":
     main()
 
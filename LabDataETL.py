@@ -5,7 +5,7 @@ import os
 from pathlib import Path
 from datetime import datetime, timezone, timedelta, date
 import numpy as np
-import psycopg2
+from lab_config import get_conn
 
 # — Shared drive root (UNC path)
 ROOT_DIR = r"Z:\Former_Group_People"  # <-- CHANGE ME
@@ -24,15 +24,13 @@ TIMESTAMP_FIELD = "ctime"  # try "mtime" if your share has weird ctime behavior
 # — Skip dotfiles/folders
 SKIP_DOTFILES = True
 
+# — Sub-day histogram bin width (minutes, must divide 1440). Bins are UTC, like the day column.
+BIN_MINUTES = 60
+
 # — Progress print every N files
 PROGRESS_EVERY = 200
 
-# — PostgreSQL connection (match your existing ETL DB so you can JOIN/UNION)
-DB_HOST = "localhost"
-DB_PORT = 5432
-DB_NAME = "lab_analytics"
-DB_USER = "postgres"
-DB_PASSWORD = "***" # <-- CHANGE ME
+# — PostgreSQL connection: lab_config.py (shared with the calendar ETL so you can JOIN/UNION)
 
 # — Target table name
 TABLE_NAME = "user_files_alumni"
@@ -68,12 +66,6 @@ def _iter_mother_folders(root_dir: str):
         yield child
 
 
-def get_conn():
-    return psycopg2.connect(
-        host=DB_HOST, port=DB_PORT, dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD
-    )
-
-
 # ============================
 # DB schema + upsert
 # ============================
@@ -82,16 +74,22 @@ CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
   mother_folder TEXT NOT NULL,
   day DATE NOT NULL,
   file_count BIGINT NOT NULL,
+  file_bins INTEGER[],
   updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
   PRIMARY KEY (mother_folder, day)
 );
+
+-- tables created before the histogram column existed
+ALTER TABLE {TABLE_NAME} ADD COLUMN IF NOT EXISTS file_bins INTEGER[];
 """
 
+# file_bins: 1440 / BIN_MINUTES counts from 00:00 UTC, so the bin width is 1440 / array_length(file_bins, 1) minutes
 UPSERT = f"""
-INSERT INTO {TABLE_NAME} (mother_folder, day, file_count, updated_at)
-VALUES (%s, %s, %s, now())
+INSERT INTO {TABLE_NAME} (mother_folder, day, file_count, file_bins, updated_at)
+VALUES (%s, %s, %s, %s, now())
 ON CONFLICT (mother_folder, day) DO UPDATE SET
   file_count = EXCLUDED.file_count,
+  file_bins = EXCLUDED.file_bins,
   updated_at = now();
 """
 
@@ -106,9 +104,27 @@ def _collapse_name(name: str) -> str:
         return base + ext
     return base[:-9] + ext
 
-def scan_counts_2025() -> dict:
-    # (mother_folder, yyyy-mm-dd) -> count
+def _n_bins(bin_minutes: int) -> int:
+    if bin_minutes <= 0 or 1440 % bin_minutes:
+        raise ValueError(f"BIN_MINUTES must divide 1440, got {bin_minutes}")
+    return 1440 // bin_minutes
+
+def _day_and_bin(dt: datetime, bin_minutes: int):
+    return dt.date(), (dt.hour * 60 + dt.minute) // bin_minutes
+
+def _add(counts: dict, bins: dict, key, b: int, n: int, n_bins: int):
+    # Histogram first: if it fails, the count is not touched either, so the two can't diverge
+    hist = bins.get(key) or [0] * n_bins
+    hist[b] += n
+    bins[key] = hist
+    counts[key] = counts.get(key, 0) + n
+
+def scan_counts_and_bins_2025() -> tuple:
+    # (mother_folder, yyyy-mm-dd) -> count, and the same keys -> (1440 / BIN_MINUTES)-long list of counts
+    bin_minutes = BIN_MINUTES          # read once, so a mid-scan change can't mix bin widths
+    n_bins = _n_bins(bin_minutes)
     counts = {}
+    bins = {}
     total_files = 0
     errors = 0
 
@@ -131,6 +147,7 @@ def scan_counts_2025() -> dict:
                 name_groups[collapsed] += 1
 
             batch_key = None
+            batch_bin = 0
 
             for collapsed, n in name_groups.items():
                 if n >= 40:
@@ -146,17 +163,18 @@ def scan_counts_2025() -> dict:
                             fp = os.path.join(dirpath, rep_file)
                             raw_dt = _get_file_time_utc(fp, TIMESTAMP_FIELD)
                             corrected_dt = raw_dt + TIME_OFFSET
-                            d = corrected_dt.date()
+                            d, b = _day_and_bin(corrected_dt, bin_minutes)
 
                             if YEAR_START <= d < YEAR_END_EXCLUSIVE:
                                 batch_key = (mother_name, d.isoformat())
+                                batch_bin = b
                         except Exception:
                             batch_key = None
                     break
 
-            # If batch rule triggered, +5 and skip this directory’s remaining files
+            # If batch rule triggered, +5 (in the representative file's bin) and skip this directory’s remaining files
             if batch_key is not None:
-                counts[batch_key] = counts.get(batch_key, 0) + 5
+                _add(counts, bins, batch_key, batch_bin, 5, n_bins)
                 continue
 
             # ----------------------------
@@ -173,27 +191,31 @@ def scan_counts_2025() -> dict:
                 try:
                     raw_dt = _get_file_time_utc(fp, TIMESTAMP_FIELD)
                     corrected_dt = raw_dt + TIME_OFFSET
-                    d = corrected_dt.date()
+                    d, b = _day_and_bin(corrected_dt, bin_minutes)
 
                     if not (YEAR_START <= d < YEAR_END_EXCLUSIVE):
                         continue
 
-                    key = (mother_name, d.isoformat())
-                    counts[key] = counts.get(key, 0) + 1
+                    _add(counts, bins, (mother_name, d.isoformat()), b, 1, n_bins)
 
                 except Exception:
                     errors += 1
                     continue
 
     print(f"Done scanning. Files scanned: {total_files:,}. Errors: {errors}. Groups: {len(counts):,}")
-    return counts
+    return counts, bins
+
+def scan_counts_2025() -> dict:
+    # (mother_folder, yyyy-mm-dd) -> count
+    return scan_counts_and_bins_2025()[0]
 
 
 
 # ============================
 # Load to PostgreSQL
 # ============================
-def upsert_counts(conn, counts: dict):
+def upsert_counts(conn, counts: dict, bins: dict = None):
+    # bins (from scan_counts_and_bins_2025) fills file_bins; without it file_bins is left NULL
     # Convert dict to numpy arrays for sorting + efficient iteration
     keys = list(counts.keys())
     mother = np.array([k[0] for k in keys], dtype=object)
@@ -211,16 +233,20 @@ def upsert_counts(conn, counts: dict):
 
         # Batch upsert
         for m, d, c in zip(mother_s, day_s, file_count_s):
-            cur.execute(UPSERT, (m, d, int(c)))
+            hist = bins.get((m, d)) if bins is not None else None
+            cur.execute(UPSERT, (m, d, int(c), hist))
 
     conn.commit()
     print(f"Upserted {len(file_count_s):,} rows into {TABLE_NAME}.")
 
 
-if __name__ == "__main__":
-    counts = scan_counts_2025()
+def main():
+    counts, bins = scan_counts_and_bins_2025()
     conn = get_conn()
     try:
-        upsert_counts(conn, counts)
+        upsert_counts(conn, counts, bins)
     finally:
         conn.close()
+
+if __name__ == "__main__":
+    main()
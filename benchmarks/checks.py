@@ -0,0 +1,348 @@
+"""
+Offline correctness checks on synthetic data (no Postgres, no Google credentials).
+
+    python -m benchmarks.checks              # run every check
+    python -m benchmarks.checks fitting      # run the named checks
+
+Each check raises AssertionError with the offending numbers when it fails.
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import shutil
+import tempfile
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import (
+    PEOPLE, FakeCalendarService, FakeHttpError, make_calendar_events, make_drive_tree,
+    make_productivity_frame,
+)
+
+
+# ============================
+# Checks
+# ============================
+def _reference_fit(formula, df, group_col="person"):
+    # fit_nb_cluster as it was before the shared design (statsmodels' default start), polished
+    # with Newton so both sides are compared at the optimum rather than where L-BFGS stopped
+    import statsmodels.api as sm
+    from patsy import dmatrices
+    from statsmodels.stats.sandwich_covariance import cov_cluster
+
+    y, X = dmatrices(formula, data=df, return_type="dataframe")
+    model = sm.NegativeBinomial(y.iloc[:, 0], X)
+    lbfgs = model.fit(method="lbfgs", maxiter=500, disp=False)
+    res = model.fit(start_params=np.asarray(lbfgs.params), method="newton", maxiter=50, disp=False)
+    res.cov_params_default = cov_cluster(res, df.loc[X.index, group_col])
+    return lbfgs, res
+
+def check_fitting(sizes=(1000, 3000), seeds=range(12), tol=1e-6):
+    # Shared design + warm starts must land on the same coefficients and cluster SEs as fit_nb_cluster
+    import DiD_fitting
+
+    worst = 0.0
+    for n in sizes:
+        for seed in seeds:
+            df = make_productivity_frame(n, seed=seed)
+            fits = DiD_fitting.fit_models(DiD_fitting.build_design(df), n_jobs=1)
+            for label, formula in DiD_fitting.MODEL_FORMULAS.items():
+                lbfgs, ref = _reference_fit(formula, df)
+                res = fits[label]
+                names = list(res.params.index)
+                d_coef = np.abs(ref.params[names].to_numpy() - res.params.to_numpy()).max()
+                ref_se = np.sqrt(np.diag(ref.cov_params_default))[[list(ref.params.index).index(c) for c in names]]
+                d_se = np.abs(ref_se - np.sqrt(np.diag(res.cov_params_default))).max()
+                where = f"n={n} seed={seed} model {label}"
+                assert d_coef < tol and d_se < tol, f"{where}: coef diff {d_coef:.3g}, SE diff {d_se:.3g}"
+                assert res.llf >= lbfgs.llf - 1e-8, f"{where}: llf {res.llf:.6f} < old {lbfgs.llf:.6f}"
+                worst = max(worst, d_coef, d_se)
+    return f"{len(sizes) * len(seeds) * 3} fits, max coef/SE diff {worst:.2g}"
+
+def check_calendar_retry_resume(n_events=5000, page_size=1000):
+    # Transient errors are retried in place; a hard failure keeps going with the other calendars
+    # and leaves a page token that a second run resumes from without losing or repeating events.
+    from calendar_client import TokenBucket, fetch_events, CalendarFetchError
+    import LabAnalyticsETL as etl
+
+    events = make_calendar_events(n_events)
+    ids = lambda evs: [e["id"] for e in evs]
+    quiet = {"sleep": lambda s: None, "rng": random.Random(0), "limiter": TokenBucket(rate=1e9, capacity=1e9)}
+
+    transient = {1: FakeHttpError(403, "rateLimitExceeded"), 2: FakeHttpError(503), 4: TimeoutError()}
+    got, stats = fetch_events(FakeCalendarService(events, page_size, transient), "cal", "a", "b", **quiet)
+    assert ids(got) == ids(events), "retried fetch lost or repeated events"
+    assert sum(s["attempts"] - 1 for s in stats) == len(transient), "retries not counted per page"
+
+    try:
+        fetch_events(FakeCalendarService(events, page_size, {1: FakeHttpError(403, "forbidden")}), "cal", "a", "b", **quiet)
+        raise AssertionError("non-retryable 403 was retried")
+    except CalendarFetchError as err:
+        assert len(err.events) == page_size and err.page_token, "failure did not keep the finished pages"
+
+    retries = {2 + k: FakeHttpError(503) for k in range(3)}
+    fetched, failures = etl.fetch_all_calendars(
+        FakeCalendarService(events, page_size, retries), ["cal_1", "cal_2"], "a", "b", max_retries=2, **quiet)
+    assert list(failures) == ["cal_1"], f"expected only cal_1 to fail, got {list(failures)}"
+    assert ids(fetched[1][1]) == ids(events), "calendars after a failure were not fetched"
+
+    tokens = {cal_id: err.page_token for cal_id, err in failures.items()}
+    resumed, failures = etl.fetch_all_calendars(FakeCalendarService(events, page_size), ["cal_1"], "a", "b",
+                                                resume_tokens=tokens, **quiet)
+    assert not failures and ids(fetched[0][1]) + ids(resumed[0][1]) == ids(events), "resume lost or repeated events"
+    return f"{n_events} events, {n_events // page_size} pages: retry, fail-and-continue and resume ok"
+
+def _random_bookings(rng, n, t0, span_days, max_hours, people):
+    # Bookings with person titles; some multi-day, some back-to-back, a few unconfirmed
+    start = pd.Timestamp(t0, tz="UTC") + pd.to_timedelta(rng.integers(0, span_days * 96, n) * 15, unit="min")
+    dur = pd.to_timedelta(rng.integers(1, max_hours * 4, n) * 15, unit="min")
+    start = pd.Series(start)
+    end = start + dur
+    chain = np.flatnonzero(rng.random(n) < 0.2)[:-1]
+    start.iloc[chain + 1] = end.iloc[chain].to_numpy()            # next booking starts when this one ends
+    end = start + dur
+    return pd.DataFrame({
+        "title": [f"{p} {w}" for p, w in zip(rng.choice(people, n), rng.choice(["xrd", "pl map", "anneal"], n))],
+        "start_date": start,
+        "end_date": end,
+        "status": np.where(rng.random(n) < 0.9, "confirmed", "cancelled"),
+    })
+
+def check_panel(n_bookings=400, seed=0, tz="America/Los_Angeles"):
+    # build_panel against a per-booking, per-day loop, across both DST changes and multi-day bookings
+    from DiD_panel import build_panel
+
+    rng = np.random.default_rng(seed)
+    date_min, date_max = "2024-03-05", "2024-03-16"           # spring forward on 2024-03-10
+    people = PEOPLE[:4]
+    cal = pd.concat([
+        _random_bookings(rng, n_bookings, "2024-03-03", 14, 60, people),
+        _random_bookings(rng, n_bookings // 4, "2024-11-01", 4, 30, people),   # fall back on 2024-11-03
+    ], ignore_index=True)
+    days = pd.date_range(date_min, date_max, freq="D", inclusive="left")
+    files = pd.DataFrame({"mother_folder": rng.choice(people, 200), "day": rng.choice(days, 200),
+                          "file_count": rng.integers(0, 50, 200)})
+
+    for lo, hi in ((date_min, date_max), ("2024-11-01", "2024-11-06")):
+        panel = build_panel(files, cal, lo, hi, persons=people, tz=tz)
+        confirmed = cal.loc[cal["status"] == "confirmed"]
+        s_local = confirmed["start_date"].dt.tz_convert(tz)
+        e_local = confirmed["end_date"].dt.tz_convert(tz)
+        for p, person in enumerate(people):
+            mine = confirmed["title"].str.lower().str.contains(person.lower()).to_numpy()
+            for d, day in enumerate(panel["days"]):
+                midnight = pd.Timestamp(day).tz_localize(tz)
+                next_midnight = (pd.Timestamp(day) + pd.Timedelta(days=1)).tz_localize(tz)
+                on_day = mine & (s_local.dt.date <= midnight.date()).to_numpy() & (e_local.dt.date >= midnight.date()).to_numpy()
+                overlap = (np.minimum(e_local[on_day], next_midnight) - np.maximum(s_local[on_day], midnight)).dt.total_seconds()
+                hours = overlap.clip(lower=0).sum() / 3600.0
+                where = f"{person} {day}"
+                assert panel["n_bookings"][p, d] == on_day.sum(), f"{where}: n_bookings {panel['n_bookings'][p, d]} != {on_day.sum()}"
+                assert abs(panel["booked_hours"][p, d] - hours) < 1e-9, f"{where}: booked_hours {panel['booked_hours'][p, d]} != {hours}"
+    return f"{len(cal)} bookings x {len(people)} people, DST days and multi-day bookings match the per-day loop"
+
+def _scan_tree(root, bin_minutes):
+    # LabDataETL's scan over a synthetic tree at the given bin width, settings restored afterwards
+    import LabDataETL as scanner
+
+    saved = (scanner.ROOT_DIR, scanner.TIMESTAMP_FIELD, scanner.PROGRESS_EVERY, scanner.BIN_MINUTES)
+    try:
+        scanner.ROOT_DIR, scanner.TIMESTAMP_FIELD, scanner.PROGRESS_EVERY = root, "mtime", 10 ** 12
+        scanner.BIN_MINUTES = bin_minutes
+        with contextlib.redirect_stdout(io.StringIO()):
+            return scanner.scan_counts_and_bins_2025()
+    finally:
+        scanner.ROOT_DIR, scanner.TIMESTAMP_FIELD, scanner.PROGRESS_EVERY, scanner.BIN_MINUTES = saved
+
+def _brute_booking_files(files, bookings, tz):
+    # (event, person) -> [file_count, shared_file_count, unbinned_file_count], one bin at a time
+    bookings = bookings.drop_duplicates("source_event_id_hash")
+    binned = files.loc[files["file_bins"].notna()]
+    unbinned = files.loc[files["file_bins"].isna()]
+    bin_s = 86400 // len(binned["file_bins"].iloc[0])
+
+    def touched(b):
+        # UTC bins [t, t + bin_s) the booking touches, as (day, bin) pairs
+        t, end = int(b.start_ts.timestamp()) // bin_s * bin_s, b.end_ts.timestamp()
+        while t < end:
+            yield pd.Timestamp(t, unit="s").date(), (t % 86400) // bin_s
+            t += bin_s
+
+    out = {}
+    timed = bookings.loc[~bookings["all_day"]]
+    for person in binned["mother_folder"].unique():
+        hist = {(pd.Timestamp(r.day).date(), k): c
+                for r in binned.loc[binned["mother_folder"] == person].itertuples() for k, c in enumerate(r.file_bins)}
+        mine = [b for b in timed.itertuples() if person.lower() in b.title.lower()]
+        claims = {}
+        for b in mine:
+            for key in touched(b):
+                claims[key] = claims.get(key, 0) + 1
+        for b in mine:
+            keys = list(touched(b))
+            out[(b.source_event_id_hash, person)] = [
+                sum(hist.get(k, 0) for k in keys), sum(hist.get(k, 0) for k in keys if claims[k] > 1), 0]
+
+    for person in unbinned["mother_folder"].unique():
+        rows = unbinned.loc[unbinned["mother_folder"] == person]
+        for b in bookings.itertuples():
+            if person.lower() not in b.title.lower():
+                continue
+            first, last = b.start_ts.tz_convert(tz).date(), b.end_ts.tz_convert(tz).date()
+            n = int(rows.loc[[first <= pd.Timestamp(d).date() <= last for d in rows["day"]], "file_count"].sum())
+            out.setdefault((b.source_event_id_hash, person), [0, 0, 0])[2] = n
+    return out
+
+def check_attribution(n_files=3000, bin_widths=(15, 60, 1440), compare_minutes=60, n_bookings=600, seed=0):
+    # Scanner histograms sum to the day counts at every bin width; booking_files_table matches a
+    # per-bin loop on a mix of rows with and without histograms
+    from booking_attribution import LOCAL_TZ, booking_files_table
+
+    root = tempfile.mkdtemp(prefix="check_drive_")
+    try:
+        make_drive_tree(root, n_files, seed=seed, start="2024-03-01", days=20)
+        scans = {m: _scan_tree(root, m) for m in set(bin_widths) | {compare_minutes}}
+        for bin_minutes in bin_widths:
+            counts, bins = scans[bin_minutes]
+            assert counts and set(counts) == set(bins), f"BIN_MINUTES={bin_minutes}: keys differ"
+            for key, n in counts.items():
+                assert len(bins[key]) == 1440 // bin_minutes, f"BIN_MINUTES={bin_minutes} {key}: {len(bins[key])} bins"
+                assert sum(bins[key]) == n, f"BIN_MINUTES={bin_minutes} {key}: bins sum {sum(bins[key])} != {n}"
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    counts, bins = scans[compare_minutes]
+    rng = np.random.default_rng(seed)
+    legacy_days = pd.date_range("2024-03-01", periods=20, freq="D")
+    files = pd.concat([
+        pd.DataFrame({"mother_folder": [k[0] for k in counts], "day": pd.to_datetime([k[1] for k in counts]),
+                      "file_count": list(counts.values()), "file_bins": [bins[k] for k in counts]}),
+        pd.DataFrame({"mother_folder": rng.choice(PEOPLE[:5], 60), "day": rng.choice(legacy_days, 60),
+                      "file_count": rng.integers(1, 40, 60), "file_bins": None}),
+    ], ignore_index=True)
+
+    cal = _random_bookings(rng, n_bookings, "2024-02-28", 24, 10, PEOPLE)
+    bookings = pd.DataFrame({
+        "source_event_id_hash": [f"e{i}" for i in range(len(cal))],
+        "title": cal["title"], "start_ts": cal["start_date"], "end_ts": cal["end_date"],
+        "all_day": rng.random(len(cal)) < 0.1,
+    })
+    bookings = pd.concat([bookings, bookings.iloc[:5]], ignore_index=True)     # same events in both tables
+
+    table = booking_files_table(files, bookings)
+    expected = _brute_booking_files(files, bookings, LOCAL_TZ)
+    got = {(r.source_event_id_hash, r.mother_folder): [r.file_count, r.shared_file_count, r.unbinned_file_count]
+           for r in table.itertuples()}
+    assert len(got) == len(table), "duplicate (event, person) rows"
+    assert set(got) == set(expected), f"row sets differ: {sorted(set(got) ^ set(expected))[:5]}"
+    bad = [(k, got[k], expected[k]) for k in got if got[k] != expected[k]]
+    assert not bad, f"{len(bad)} rows differ, e.g. {bad[:3]}"
+    return f"bin widths {', '.join(map(str, bin_widths))} min; {len(table)} booking rows match the per-bin loop"
+
+def check_occupancy(n_bookings=400, n_calendars=3, seed=0):
+    # occupancy_tables against O(n^2) loops, with back-to-back bookings (end == next start),
+    # hour-aligned edges, zero-length and all-day events, and missing or late created_ts
+    from occupancy import HOUR, occupancy_tables
+
+    rng = np.random.default_rng(seed)
+    t0 = pd.Timestamp("2024-03-01", tz="UTC")
+    offset = rng.integers(0, 7 * 86400, n_bookings)
+    offset = np.where(rng.random(n_bookings) < 0.5, offset // 900 * 900, offset)     # half on the quarter hour
+    start = t0 + pd.to_timedelta(offset, unit="s")
+    dur = pd.to_timedelta(rng.integers(0, 6 * 4, n_bookings) * 900, unit="s")
+    start, end = pd.Series(start), pd.Series(start + dur)
+    chain = np.flatnonzero(rng.random(n_bookings) < 0.3)[:-1]
+    start.iloc[chain + 1] = end.iloc[chain].to_numpy()
+    end = start + dur
+    created = start - pd.to_timedelta(rng.integers(-3600, 3 * 86400, n_bookings), unit="s")
+    bookings = pd.DataFrame({
+        "source_event_id_hash": [f"e{i}" for i in range(n_bookings)],
+        "calendar_id_hash": rng.choice([f"cal_{k}" for k in range(n_calendars)], n_bookings),
+        "start_ts": start, "end_ts": end,
+        "created_ts": created.where(rng.random(n_bookings) < 0.9),
+        "all_day": rng.random(n_bookings) < 0.05,
+    })
+    per_booking, hourly, _, _ = occupancy_tables(bookings)
+
+    b = bookings.loc[~bookings["all_day"] & (bookings["end_ts"] > bookings["start_ts"])]
+    sec = lambda ts: ((ts - t0) // pd.Timedelta(seconds=1)).to_numpy() + int(t0.timestamp())
+    s, e = sec(b["start_ts"]), sec(b["end_ts"])
+    c = np.minimum(sec(b["created_ts"].fillna(b["start_ts"])), s)
+    cal = b["calendar_id_hash"].to_numpy()
+    got = per_booking.set_index("source_event_id_hash")
+    assert len(got) == len(b), f"{len(got)} bookings kept, expected {len(b)}"
+    for i, eid in enumerate(b["source_event_id_hash"]):
+        others = (cal == cal[i]) & (np.arange(len(b)) != i)
+        overlaps = int((others & (s < e[i]) & (e > s[i])).sum())
+        pending = int((others & (c <= c[i]) & (s > c[i])).sum())
+        assert got.at[eid, "n_overlaps"] == overlaps, f"{eid}: n_overlaps {got.at[eid, 'n_overlaps']} != {overlaps}"
+        assert got.at[eid, "queue_depth"] == pending, f"{eid}: queue_depth {got.at[eid, 'queue_depth']} != {pending}"
+
+    expected = {}
+    for k in np.unique(cal):
+        mine = cal == k
+        for h in range(s[mine].min() // HOUR * HOUR, e[mine].max(), HOUR):
+            clipped = sorted((max(a, h), min(z, h + HOUR)) for a, z in zip(s[mine], e[mine]) if a < h + HOUR and z > h)
+            busy, reach = 0, h
+            for a, z in clipped:
+                busy += max(0, z - max(a, reach))
+                reach = max(reach, z)
+            if busy:
+                expected[(k, h)] = busy / HOUR
+    got = {(r.calendar_id_hash, int(r.hour_start.timestamp())): r.booked_frac for r in hourly.itertuples()}
+    assert set(got) == set(expected), f"hour sets differ: {sorted(set(got) ^ set(expected))[:5]}"
+    worst = max(abs(got[k] - expected[k]) for k in got)
+    assert worst < 1e-6, f"booked_frac off by {worst:.3g}"
+    return f"{len(b)} bookings on {n_calendars} calendars, {len(got)} hours match the pairwise loops"
+
+def check_resampling(n_rows=1500, n_reps=250, seed=7):
+    # Bootstrap and permutation draws depend only on the seed: identical for 1 and 2 workers
+    import DiD_fitting
+    from DiD_inference import cluster_permutation_test, wild_cluster_bootstrap
+
+    design = DiD_fitting.build_design(make_productivity_frame(n_rows, seed=0))
+    fits = DiD_fitting.fit_models(design, n_jobs=1)
+
+    runs = {}
+    for n_jobs in (1, 2):
+        observed, draws = wild_cluster_bootstrap(design, fits, n_reps=n_reps, seed=seed, n_jobs=n_jobs)
+        perm = cluster_permutation_test(design, fits, n_reps=n_reps, seed=seed, n_jobs=n_jobs)
+        runs[n_jobs] = (observed, draws, perm)
+
+    (obs1, boot1, perm1), (obs2, boot2, perm2) = runs[1], runs[2]
+    assert boot1.shape == (n_reps, 3), f"bootstrap draws have shape {boot1.shape}"
+    assert obs1.equals(obs2) and boot1.equals(boot2), "bootstrap draws differ between n_jobs=1 and n_jobs=2"
+    assert perm1[0] == perm2[0] and np.array_equal(perm1[1], perm2[1]) and perm1[2] == perm2[2], \
+        "permutation draws differ between n_jobs=1 and n_jobs=2"
+    other = wild_cluster_bootstrap(design, fits, n_reps=n_reps, seed=seed + 1, n_jobs=1)[1]
+    assert not boot1.equals(other), "bootstrap draws ignore the seed"
+    return f"{n_reps} bootstrap and permutation draws identical for n_jobs=1 and 2"
+
+CHECKS = {
+    "fitting": check_fitting,
+    "calendar": check_calendar_retry_resume,
+    "panel": check_panel,
+    "attribution": check_attribution,
+    "occupancy": check_occupancy,
+    "resampling": check_resampling,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the offline correctness checks.")
+    parser.add_argument("checks", nargs="*", help=f"default: all of {', '.join(CHECKS)}")
+    args = parser.parse_args(argv)
+    unknown = [c for c in args.checks if c not in CHECKS]
+    if unknown:
+        parser.error(f"unknown check(s): {', '.join(unknown)}")
+
+    warnings.filterwarnings("ignore")   # statsmodels convergence chatter from the reference fits
+    for name in args.checks or list(CHECKS):
+        print(f"{name:<12} ok  {CHECKS[name]()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Benchmark every pipeline stage on synthetic data and write the timings as JSON.
+
+    python -m benchmarks.run_benchmarks --scales small medium --output bench_results.json
+    python -m benchmarks.run_benchmarks --compare bench_results_old.json
+
+Stages that need Postgres run against a separate benchmark database (tables there are dropped
+and recreated); they are recorded as skipped when it can't be reached or a dependency is missing.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks.synthetic import (
+    FakeCalendarService,
+    make_calendar_events,
+    make_drive_tree,
+    make_productivity_frame,
+    make_productivity_view_rows,
+)
+
+# ============================
+# Settings
+# ============================
+SCALES = {
+    "small": {"events": 1_000, "files": 2_000, "rows": 1_000},
+    "medium": {"events": 10_000, "files": 10_000, "rows": 5_000},
+    "large": {"events": 50_000, "files": 50_000, "rows": 20_000},
+}
+
+# Host/user/password come from lab_config.py
+BENCH_DB_NAME = "lab_analytics_bench"   # never the production database: tables here are dropped
+
+CALENDAR_ID = "bench@group.calendar.google.com"
+HMAC_SECRET = "bench-secret"
+
+
+class Skip(Exception):
+    pass
+
+
+# ============================
+# Helpers
+# ============================
+def _timed(fn, repeats, setup=None):
+    times = []
+    out = None
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        t = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t)
+    return times, out
+
+def _bench_conn():
+    try:
+        import psycopg2
+        from lab_config import get_conn
+    except ImportError as e:
+        raise Skip(f"missing dependency: {e.name}")
+    try:
+        return get_conn(dbname=BENCH_DB_NAME, connect_timeout=3)
+    except psycopg2.OperationalError as e:
+        raise Skip(f"benchmark database unavailable: {str(e).strip().splitlines()[0]}")
+
+def _import(name):
+    try:
+        return __import__(name)
+    except ImportError as e:
+        raise Skip(f"missing dependency: {e.name}")
+
+def _drop(conn, *tables):
+    with conn.cursor() as cur:
+        for t in tables:
+            cur.execute(f"DROP TABLE IF EXISTS {t}")
+    conn.commit()
+
+
+# ============================
+# Stages
+# ============================
+def bench_calendar(scale, repeats, state):
+    etl = _import("LabAnalyticsETL")
+    from calendar_client import TokenBucket, fetch_events
+
+    events = make_calendar_events(scale["events"])
+    results = {}
+
+    # Unthrottled bucket: time the paging/projection work, not the quota pacing
+    service = FakeCalendarService(events)
+    unlimited = TokenBucket(rate=1e12, capacity=1e12)
+    times, (fetched, _) = _timed(lambda: fetch_events(service, CALENDAR_ID, "2020-01-01T00:00:00Z", "2026-01-01T00:00:00Z", limiter=unlimited), repeats)
+    results["fetch_events"] = (times, len(fetched))
+
+    def deid_all():
+        rows = [etl.deid_event(e, CALENDAR_ID, HMAC_SECRET) for e in fetched]
+        for r in rows:
+            etl.featurize(r)
+        return rows
+    times, rows = _timed(deid_all, repeats)
+    results["deid_featurize"] = (times, len(rows))
+    state["deid_rows"] = rows
+    return results
+
+def bench_load_events(scale, repeats, state):
+    etl = _import("LabAnalyticsETL")
+    rows = state.get("deid_rows")
+    if rows is None:
+        raise Skip("calendar stage did not run")
+
+    conn = _bench_conn()
+    try:
+        def fresh():
+            _drop(conn, "raw_events_deid", "event_features")
+            etl.run_ddl(conn)
+        times, _ = _timed(lambda: etl.load_events(conn, rows), repeats, setup=fresh)
+    finally:
+        conn.close()
+    return {"load_events": (times, len(rows))}
+
+def bench_scan(scale, repeats, state):
+    scanner = _import("LabDataETL")
+    root = tempfile.mkdtemp(prefix="bench_drive_")
+    saved = (scanner.ROOT_DIR, scanner.TIMESTAMP_FIELD, scanner.PROGRESS_EVERY)
+    try:
+        n_files = make_drive_tree(root, scale["files"])
+        scanner.ROOT_DIR = root
+        scanner.TIMESTAMP_FIELD = "mtime"     # synthetic timestamps can only be set through mtime
+        scanner.PROGRESS_EVERY = 10 ** 12
+        # reported as scan_counts_2025 so results stay comparable with runs from before the histograms
+        times, (counts, bins) = _timed(scanner.scan_counts_and_bins_2025, repeats)
+    finally:
+        scanner.ROOT_DIR, scanner.TIMESTAMP_FIELD, scanner.PROGRESS_EVERY = saved
+        shutil.rmtree(root, ignore_errors=True)
+    state["counts"] = counts
+    state["bins"] = bins
+    return {"scan_counts_2025": (times, n_files)}
+
+def bench_upsert_counts(scale, repeats, state):
+    scanner = _import("LabDataETL")
+    counts = state.get("counts")
+    if counts is None:
+        raise Skip("scan stage did not run")
+
+    conn = _bench_conn()
+    try:
+        times, _ = _timed(lambda: scanner.upsert_counts(conn, counts, state.get("bins")), repeats,
+                          setup=lambda: _drop(conn, scanner.TABLE_NAME))
+    finally:
+        conn.close()
+    return {"upsert_counts": (times, len(counts))}
+
+def bench_cleaning(scale, repeats, state):
+    from DiD_analysis import clean_productivity
+
+    raw = make_productivity_view_rows(scale["rows"])
+    times, _ = _timed(lambda: clean_productivity(raw), repeats)
+    return {"clean_productivity": (times, len(raw))}
+
+def bench_models(scale, repeats, state):
+    _import("statsmodels")
+    from DiD_fitting import MODEL_FORMULAS, build_design, fit_models
+
+    df = make_productivity_frame(scale["rows"])
+    times, design = _timed(lambda: build_design(df, MODEL_FORMULAS, group_col="person"), repeats)
+    results = {"nb_design": (times, len(df))}
+
+    times, _ = _timed(lambda: fit_models(design, n_jobs=1), repeats)
+    results["nb_fits_ABC"] = (times, len(df))
+    return results
+
+STAGES = [bench_calendar, bench_load_events, bench_scan, bench_upsert_counts, bench_cleaning, bench_models]
+
+
+# ============================
+# Run / report
+# ============================
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip() or None
+    except OSError:
+        return None
+
+def _versions():
+    out = {"python": platform.python_version()}
+    for mod in ("numpy", "pandas", "statsmodels", "psycopg2"):
+        try:
+            out[mod] = __import__(mod).__version__
+        except ImportError:
+            out[mod] = None
+    return out
+
+def run(scales, repeats):
+    records = []
+    for scale_name in scales:
+        scale = SCALES[scale_name]
+        state = {}
+        for stage in STAGES:
+            try:
+                results = stage(scale, repeats, state)
+            except Skip as e:
+                records.append({"stage": stage.__name__.replace("bench_", ""), "scale": scale_name, "skipped": str(e)})
+                print(f"[{scale_name}] {stage.__name__}: skipped ({e})")
+                continue
+
+            for name, (times, n_items) in results.items():
+                rec = {
+                    "stage": name,
+                    "scale": scale_name,
+                    "n_items": n_items,
+                    "repeats": len(times),
+                    "times_s": times,
+                    "min_s": min(times),
+                    "median_s": statistics.median(times),
+                    "per_item_us": 1e6 * statistics.median(times) / max(n_items, 1),
+                }
+                records.append(rec)
+                print(f"[{scale_name}] {name:<18} n={n_items:<8,} median {rec['median_s']:.4f}s  ({rec['per_item_us']:.1f} us/item)")
+    return records
+
+def compare(records, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {(r["stage"], r["scale"]): r for r in json.load(f)["results"] if "median_s" in r}
+
+    print(f"\nvs {baseline_path} (ratio > 1 is slower):")
+    for r in records:
+        old = baseline.get((r["stage"], r["scale"]))
+        if "median_s" in r and old is not None:
+            print(f"  [{r['scale']}] {r['stage']:<18} {r['median_s'] / old['median_s']:.2f}x")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the lab analytics pipeline on synthetic data.")
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=["small", "medium"])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", default=None, help="earlier results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    records = run(args.scales, args.repeats)
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "commit": _git_commit(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "versions": _versions(),
+        "scales": {s: SCALES[s] for s in args.scales},
+        "results": records,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.compare:
+        compare(records, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Synthetic inputs for the benchmark suite: Google Calendar event pages behind a fake
+service.events().list() stub, a shared-drive tree for LabDataETL, and a model-ready
+productivity_table frame.
+"""
+
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+# LabDataETL._iter_mother_folders only accepts these folder names
+PEOPLE = ["Carmelita", "Kimo", "Kelly", "Diana", "Stephen", "Tyler", "Laura"]
+
+TITLE_WORDS = ["xrd", "temp sweep", "405 nm laser", "led", "pl map", "anneal", "calibration", "sample B2"]
+
+
+# ============================
+# Google Calendar
+# ============================
+def _rfc3339(dt):
+    return dt.isoformat().replace("+00:00", "Z")
+
+def make_calendar_events(n_events, seed=0, start="2020-01-01", days=2190):
+    # Event resources shaped like the Calendar API v3 response items deid_event reads
+    rng = np.random.default_rng(seed)
+    t0 = datetime.fromisoformat(start).replace(tzinfo=timezone.utc)
+    start_min = rng.integers(0, days * 24 * 60, n_events)
+    dur_min = rng.integers(30, 8 * 60, n_events)
+    lead_min = rng.integers(0, 30 * 24 * 60, n_events)
+    n_words = rng.integers(0, 4, n_events)
+    people = rng.choice(PEOPLE, n_events)
+
+    events = []
+    for i in range(n_events):
+        s = t0 + timedelta(minutes=int(start_min[i]))
+        created = s - timedelta(minutes=int(lead_min[i]))
+        title = " ".join([people[i]] + list(rng.choice(TITLE_WORDS, n_words[i])))
+        ev = {
+            "id": f"evt{seed}_{i:08d}",
+            "status": "cancelled" if rng.random() < 0.05 else "confirmed",
+            "summary": title,
+            "start": {"dateTime": _rfc3339(s), "timeZone": "America/Los_Angeles"},
+            "end": {"dateTime": _rfc3339(s + timedelta(minutes=int(dur_min[i])))},
+            "created": _rfc3339(created),
+            "updated": _rfc3339(created + timedelta(minutes=int(rng.integers(0, 60)))),
+            "organizer": {"email": f"{people[i].lower()}@lab.example.edu"},
+            "attendees": [{"email": f"{p.lower()}@lab.example.edu"} for p in rng.choice(PEOPLE, rng.integers(0, 3))],
+        }
+        if rng.random() < 0.3:
+            ev["location"] = "Room 101"
+        # Fields the API returns by default but deid_event never reads
+        ev.update({
+            "kind": "calendar#event",
+            "etag": f'"{3000000000000000 + i}"',
+            "htmlLink": f"https://www.google.com/calendar/event?eid={ev['id']}",
+            "iCalUID": f"{ev['id']}@google.com",
+            "creator": dict(ev["organizer"]),
+            "description": "Sample prep notes. " * int(rng.integers(0, 6)),
+            "reminders": {"useDefault": True},
+            "eventType": "default",
+            "sequence": 0,
+        })
+        events.append(ev)
+    return events
+
+
+class FakeHttpError(Exception):
+    """Shaped like googleapiclient.errors.HttpError (status on .resp, body in .content)."""
+
+    def __init__(self, status, reason=""):
+        super().__init__(f"<HttpError {status} {reason}>")
+        self.resp = type("Resp", (), {"status": status})()
+        self.content = json.dumps({"error": {"errors": [{"reason": reason}]}}).encode("utf-8")
+
+
+class FakeCalendarService:
+    """
+    Stands in for build("calendar", "v3", ...): service.events().list(...).execute().
+
+    `errors` maps a call number (0-based) to the exception that call raises, e.g.
+    {1: FakeHttpError(403, "rateLimitExceeded")}. A `fields=` projection is applied to the items.
+    """
+
+    def __init__(self, events, page_size=2500, errors=None):
+        self._events = events
+        self._page_size = page_size
+        self._errors = dict(errors or {})
+        self.calls = 0
+
+    def events(self):
+        return self
+
+    def list(self, calendarId=None, pageToken=None, maxResults=2500, fields=None, **kwargs):
+        return _FakeListRequest(self, int(pageToken or 0), min(maxResults, self._page_size), fields)
+
+
+def _item_fields(fields):
+    # Top-level item keys from a projection like "nextPageToken,items(id,start(date),organizer/email)"
+    if not fields or "items(" not in fields:
+        return None
+    inner = fields.split("items(", 1)[1]
+    keys, depth, cur = [], 0, ""
+    for ch in inner:
+        if depth == 0 and ch in ",)":
+            keys.append(cur.split("/")[0].split("(")[0].strip())
+            cur = ""
+            if ch == ")":
+                break
+            continue
+        depth += (ch == "(") - (ch == ")")
+        cur += ch
+    return set(k for k in keys if k)
+
+
+class _FakeListRequest:
+    def __init__(self, service, offset, page_size, fields):
+        self._service = service
+        self._offset = offset
+        self._page_size = page_size
+        self._fields = _item_fields(fields)
+
+    def execute(self):
+        call = self._service.calls
+        self._service.calls += 1
+        if call in self._service._errors:
+            raise self._service._errors[call]
+
+        end = self._offset + self._page_size
+        items = self._service._events[self._offset:end]
+        if self._fields is not None:
+            items = [{k: v for k, v in ev.items() if k in self._fields} for ev in items]
+        resp = {"items": items}
+        if end < len(self._service._events):
+            resp["nextPageToken"] = str(end)
+        return resp
+
+
+# ============================
+# Shared drive tree
+# ============================
+def make_drive_tree(root, n_files, seed=0, batch_fraction=0.3, start="2020-01-01", days=2190):
+    """
+    Write a synthetic mother-folder tree under `root` and return the number of files created.
+
+    Folders are either per-datum batches (>= 40 files that collapse to one name, which the
+    scanner short-circuits) or ordinary experiment folders. Timestamps are set through mtime,
+    so benchmark the scan with TIMESTAMP_FIELD = "mtime".
+    """
+    rng = np.random.default_rng(seed)
+    t0 = datetime.fromisoformat(start).replace(tzinfo=timezone.utc).timestamp()
+    created = 0
+    folder = 0
+    while created < n_files:
+        person = PEOPLE[folder % len(PEOPLE)]
+        d = os.path.join(root, person, f"exp_{folder:05d}")
+        os.makedirs(d, exist_ok=True)
+        ts = t0 + float(rng.integers(0, days * 86400))
+
+        if rng.random() < batch_fraction:
+            names = [f"datum_{j:09d}.csv" for j in range(int(rng.integers(40, 120)))]
+        else:
+            names = [f"{w.replace(' ', '_')}_{j}.dat" for j, w in enumerate(rng.choice(TITLE_WORDS, int(rng.integers(1, 20))))]
+
+        for name in names[: n_files - created]:
+            fp = os.path.join(d, name)
+            with open(fp, "w") as f:
+                f.write("0")
+            os.utime(fp, (ts, ts))
+            ts += float(rng.integers(1, 600))
+            created += 1
+        folder += 1
+    return created
+
+
+# ============================
+# productivity_table
+# ============================
+def make_productivity_view_rows(n_rows, seed=0):
+    # Raw productivity_table view rows (before DiD_analysis.clean_productivity), with ~5% duplicate person-days
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2020-01-01", tz="UTC") + pd.to_timedelta(rng.integers(0, 2190 * 24, n_rows), unit="h")
+    duration = rng.gamma(2.0, 2.0, n_rows)
+    people = rng.choice(PEOPLE, n_rows)
+    titles = [" ".join([p] + list(rng.choice(TITLE_WORDS, k))) for p, k in zip(people, rng.integers(0, 4, n_rows))]
+
+    df = pd.DataFrame({
+        "event_title": titles,
+        "date": start.tz_localize(None).normalize(),
+        "event_start_date": start,
+        "event_end_date": start + pd.to_timedelta(duration, unit="h"),
+        "event_duration": duration,
+        "lead_time_hr": rng.normal(48.0, 60.0, n_rows),
+        "title_length": [len(t) for t in titles],
+        "mentions_wavelength_lightsource": rng.binomial(1, 0.3, n_rows).astype(bool),
+        "mother_folder": people,
+        "file_count": rng.negative_binomial(1.0, 0.05, n_rows),
+    })
+    dup = df.sample(frac=0.05, random_state=seed)
+    return pd.concat([df, dup.assign(event_duration=dup["event_duration"] / 2)], ignore_index=True)
+
+def make_productivity_frame(n_rows, seed=0, policy_date="2025-01-01"):
+    # Model-ready rows (post-cleaning columns) with an NB2 response and a known policy effect
+    rng = np.random.default_rng(seed)
+    dates = pd.to_datetime("2020-01-01") + pd.to_timedelta(rng.integers(0, 2190, n_rows), unit="D")
+    df = pd.DataFrame({"person": rng.choice(PEOPLE, n_rows), "date": dates.date})
+    df["day_of_week"] = dates.day_name()
+    df["is_post_policy"] = (dates >= pd.to_datetime(policy_date)).astype(int)
+    df["title_len"] = rng.gamma(2.0, 5.0, n_rows) + 5.0 * df["is_post_policy"]
+    df["event_duration"] = rng.gamma(2.0, 2.0, n_rows)
+    df["lead_time_hr_clean"] = rng.exponential(2.0, n_rows)
+    df["mentions_wave"] = rng.binomial(1, 0.3, n_rows)
+
+    mu = np.exp(2.5 + 0.3 * df["is_post_policy"] + 0.01 * df["title_len"]
+                + 0.05 * df["event_duration"] + 0.5 * df["mentions_wave"])
+    alpha = 1.2
+    df["files"] = rng.negative_binomial(1.0 / alpha, 1.0 / (1.0 + alpha * mu))
+    return df
@@ -0,0 +1,199 @@
+"""
+Attribute files to individual bookings using the sub-day histograms (file_bins) written by LabDataETL.
+
+Each person's bins are laid on one global UTC grid and turned into a cumulative count, so the files
+inside any booking's start_ts..end_ts window are C[end_bin] - C[start_bin]: one vectorized look-up per
+(person, booking) pair, no matter how many bookings share a day. Bins that a booking only partly covers
+count in full, so resolution is BIN_MINUTES.
+
+Rows of the `files` view without histograms (user_files, user_files_2025 were scanned before they
+existed) can't be placed inside a booking; their counts are reported separately as
+unbinned_file_count, matched by day the way Join_Cal_and_Files.sql does. All-day events take part
+only in that day match.
+"""
+
+import numpy as np
+import pandas as pd
+
+from DiD_panel import epoch_seconds, local_days, match_people
+
+FILES_QUERY = """
+SELECT mother_folder, day, file_count, file_bins
+FROM files
+"""
+
+# Both event tables, like the calendar_events view (Cal_SQL.sql) that Join_Cal_and_Files.sql joins on
+BOOKINGS_QUERY = """
+SELECT source_event_id_hash, title, start_ts, end_ts, all_day
+FROM raw_events_deid
+WHERE status ILIKE 'confirmed'
+UNION ALL
+SELECT source_event_id_hash, title, start_ts, end_ts, all_day
+FROM raw_events_deid_2025
+WHERE status ILIKE 'confirmed'
+"""
+
+DDL = """
+CREATE TABLE IF NOT EXISTS booking_files (
+  source_event_id_hash TEXT NOT NULL,
+  mother_folder TEXT NOT NULL,
+  file_count INT NOT NULL,
+  shared_file_count INT NOT NULL,
+  unbinned_file_count INT NOT NULL DEFAULT 0,
+  bin_minutes INT NOT NULL,
+  PRIMARY KEY (source_event_id_hash, mother_folder)
+);
+
+-- tables created before unbinned sources were read
+ALTER TABLE booking_files ADD COLUMN IF NOT EXISTS unbinned_file_count INT NOT NULL DEFAULT 0;
+"""
+
+# Join_Cal_and_Files.sql compares file days with start_ts::date / end_ts::date in the session time zone
+LOCAL_TZ = "America/Los_Angeles"
+
+
+# ============================
+# Index + look-up
+# ============================
+def build_bin_index(bins_frame):
+    """
+    Cumulative per-person file counts on a global UTC bin grid.
+
+    Returns a dict with `persons` (P,), `day0` (first day), `t0` (grid origin, epoch seconds),
+    `bin_s` (bin width, seconds) and `cum` (P, n_bins + 1) with cum[p, k] = files of person p in
+    bins before k.
+    """
+    hists = [np.asarray(h, dtype=np.int64) for h in bins_frame["file_bins"]]
+    n_bins = {len(h) for h in hists}
+    if len(n_bins) > 1:
+        raise ValueError(f"file_bins rows have different lengths {sorted(n_bins)}; rescan with one BIN_MINUTES")
+    per_day = n_bins.pop() if n_bins else 1
+
+    folders = bins_frame["mother_folder"].astype(str).to_numpy()
+    persons, p_code = np.unique(folders, return_inverse=True)
+    days = pd.to_datetime(bins_frame["day"]).to_numpy().astype("datetime64[D]")
+    day0 = days.min() if len(days) else np.datetime64("1970-01-01")
+    d_ord = (days - day0).astype(np.int64)
+    n_days = int(d_ord.max()) + 1 if len(d_ord) else 0
+
+    grid = np.zeros((len(persons), n_days * per_day), dtype=np.int64)
+    if hists:
+        cols = d_ord[:, None] * per_day + np.arange(per_day)
+        np.add.at(grid, (np.repeat(p_code, per_day), cols.ravel()), np.concatenate(hists))
+
+    cum = np.zeros((len(persons), grid.shape[1] + 1), dtype=np.int64)
+    np.cumsum(grid, axis=1, out=cum[:, 1:])
+    return {
+        "persons": persons,
+        "day0": day0,
+        "t0": int(day0.astype("datetime64[s]").astype(np.int64)),
+        "bin_s": 86400 // per_day,
+        "cum": cum,
+    }
+
+def build_day_index(files_frame):
+    # Daily counts of rows without histograms, as a one-bin-per-day index
+    return build_bin_index(pd.DataFrame({
+        "mother_folder": files_frame["mother_folder"],
+        "day": files_frame["day"],
+        "file_bins": [[int(c)] for c in files_frame["file_count"]],
+    }))
+
+def attribute_files(index, bookings):
+    """
+    Files per (booking, person) from a bin index and a BOOKINGS_QUERY frame.
+
+    file_count covers every bin the booking touches; shared_file_count is the part of it that falls
+    in bins also touched by another of that person's bookings (back-to-back or overlapping sessions).
+    """
+    p_code, b_idx = match_people(bookings["title"].fillna("").to_numpy(), index["persons"])
+    n_cols = index["cum"].shape[1] - 1
+    start = epoch_seconds(bookings["start_ts"])[b_idx] - index["t0"]
+    end = epoch_seconds(bookings["end_ts"])[b_idx] - index["t0"]
+    lo = np.clip(start // index["bin_s"], 0, n_cols)
+    hi = np.clip(-(-end // index["bin_s"]), lo, n_cols)
+
+    cum = index["cum"]
+    files = cum[p_code, hi] - cum[p_code, lo]
+
+    # Bins claimed by more than one booking of the same person: difference array over the grid
+    claims = np.zeros((len(index["persons"]), n_cols + 1), dtype=np.int64)
+    np.add.at(claims, (p_code, lo), 1)
+    np.add.at(claims, (p_code, hi), -1)
+    shared = np.cumsum(claims, axis=1)[:, :-1] > 1
+    shared_cum = np.zeros_like(cum)
+    np.cumsum(np.diff(cum, axis=1) * shared, axis=1, out=shared_cum[:, 1:])
+    shared_files = shared_cum[p_code, hi] - shared_cum[p_code, lo]
+
+    return pd.DataFrame({
+        "source_event_id_hash": bookings["source_event_id_hash"].to_numpy()[b_idx],
+        "mother_folder": index["persons"][p_code],
+        "file_count": files,
+        "shared_file_count": shared_files,
+        "bin_minutes": index["bin_s"] // 60,
+    })
+
+def attribute_unbinned(day_index, bookings, tz=LOCAL_TZ):
+    # Files on the booking's days (start::date through end::date), from sources without histograms;
+    # all-day events included, as in Join_Cal_and_Files.sql
+    p_code, b_idx = match_people(bookings["title"].fillna("").to_numpy(), day_index["persons"])
+    n_cols = day_index["cum"].shape[1] - 1
+    first = (local_days(bookings["start_ts"], tz)[b_idx] - day_index["day0"]).astype(np.int64)
+    last = (local_days(bookings["end_ts"], tz)[b_idx] - day_index["day0"]).astype(np.int64)
+    lo = np.clip(first, 0, n_cols)
+    hi = np.clip(last + 1, lo, n_cols)
+    cum = day_index["cum"]
+
+    return pd.DataFrame({
+        "source_event_id_hash": bookings["source_event_id_hash"].to_numpy()[b_idx],
+        "mother_folder": day_index["persons"][p_code],
+        "unbinned_file_count": cum[p_code, hi] - cum[p_code, lo],
+    })
+
+def booking_files_table(files, bookings):
+    # files: FILES_QUERY frame (file_bins NULL for sources scanned without histograms).
+    # All-day events only count toward the day match: their window is not instrument time.
+    # An event present in both event tables is attributed once.
+    bookings = bookings.drop_duplicates("source_event_id_hash")
+    has_bins = files["file_bins"].notna()
+    timed = bookings.loc[~bookings["all_day"].astype(bool)]
+    binned = attribute_files(build_bin_index(files.loc[has_bins]), timed)
+    unbinned = attribute_unbinned(build_day_index(files.loc[~has_bins]), bookings)
+
+    table = binned.drop(columns="bin_minutes").merge(unbinned, on=["source_event_id_hash", "mother_folder"], how="outer")
+    for col in ("file_count", "shared_file_count", "unbinned_file_count"):
+        table[col] = table[col].fillna(0).astype(np.int64)
+    table["bin_minutes"] = int(binned["bin_minutes"].iloc[0]) if len(binned) else 0
+    return table
+
+
+# ============================
+# Load / store (Postgres)
+# ============================
+def store_booking_files(conn, table):
+    # Derived table: replace its contents in one transaction
+    from psycopg2.extras import execute_values
+
+    cols = ["source_event_id_hash", "mother_folder", "file_count", "shared_file_count", "unbinned_file_count", "bin_minutes"]
+    rows = [(e, m, int(f), int(s), int(u), int(b)) for e, m, f, s, u, b in table[cols].itertuples(index=False)]
+    with conn.cursor() as cur:
+        cur.execute(DDL)
+        cur.execute("TRUNCATE booking_files")
+        execute_values(cur, f"INSERT INTO booking_files ({', '.join(cols)}) VALUES %s", rows, page_size=5000)
+    conn.commit()
+    unbinned = int((table["unbinned_file_count"] > 0).sum())
+    print(f"Wrote {len(rows):,} rows into booking_files ({unbinned:,} with files from sources without histograms).")
+
+def main():
+    from lab_config import get_conn
+
+    conn = get_conn()
+    try:
+        files = pd.read_sql(FILES_QUERY, conn)
+        table = booking_files_table(files, pd.read_sql(BOOKINGS_QUERY, conn))
+        store_booking_files(conn, table)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Quota-aware Google Calendar events fetcher.
+
+- asks only for the fields deid_event reads (fields= projection)
+- paces requests with a token bucket sized to the API quota
+- retries rate-limit (403/429) and 5xx errors with jittered exponential backoff, resuming from the
+  page token that failed instead of starting the calendar over
+- records latency and approximate payload bytes per page
+
+Works with any object shaped like service.events().list(...).execute(), so the fake service in
+benchmarks/synthetic.py is enough to exercise it offline.
+"""
+
+import json
+import random
+import socket
+import threading
+import time
+
+# Everything deid_event / parse_dt read from an event resource
+EVENT_FIELDS = (
+    "nextPageToken,"
+    "items(id,status,summary,location,created,updated,recurrence,"
+    "start(date,dateTime,timeZone),end(date,dateTime,timeZone),"
+    "organizer/email,attendees/email)"
+)
+
+# Calendar API default quota is 600 queries/min per user; stay well under it
+RATE_PER_S = 5.0
+BURST = 10
+
+MAX_RETRIES = 8
+BASE_DELAY_S = 1.0
+MAX_DELAY_S = 64.0
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded", "quotaExceeded")
+
+
+# ============================
+# Rate limiting
+# ============================
+class TokenBucket:
+    """Allow `rate` requests per second on average with bursts up to `capacity`."""
+
+    def __init__(self, rate=RATE_PER_S, capacity=BURST, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._clock = clock
+        self._sleep = sleep
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        # Returns the seconds spent waiting for a token
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return waited
+                wait = (1.0 - self._tokens) / self.rate
+            self._sleep(wait)
+            waited += wait
+
+
+# ============================
+# Errors
+# ============================
+class CalendarFetchError(Exception):
+    """Retries ran out. Carries what was fetched so far and the page token to resume from."""
+
+    def __init__(self, calendar_id, page_token, events, stats, cause):
+        super().__init__(f"{calendar_id}: giving up at page token {page_token!r} after {len(events)} events: {cause!r}")
+        self.calendar_id = calendar_id
+        self.page_token = page_token
+        self.events = events
+        self.stats = stats
+        self.cause = cause
+
+class CalendarFetchErrors(Exception):
+    """Some calendars ran out of retries. failures maps calendar_id -> CalendarFetchError."""
+
+    def __init__(self, failures):
+        super().__init__("; ".join(str(err) for err in failures.values()))
+        self.failures = failures
+
+def _http_status(exc):
+    # googleapiclient.errors.HttpError keeps the status on exc.resp; avoid importing the client here
+    resp = getattr(exc, "resp", None)
+    status = getattr(resp, "status", None) or getattr(exc, "status_code", None)
+    try:
+        return int(status)
+    except (TypeError, ValueError):
+        return None
+
+def is_retryable(exc):
+    if isinstance(exc, (socket.timeout, TimeoutError, ConnectionError)):
+        return True
+    status = _http_status(exc)
+    if status in RETRY_STATUS:
+        return True
+    if status == 403:
+        # 403 is only transient when it is a rate limit, not a permissions problem
+        content = getattr(exc, "content", b"") or b""
+        if isinstance(content, bytes):
+            content = content.decode("utf-8", "replace")
+        return any(r in str(content) or r in str(exc) for r in RATE_LIMIT_REASONS)
+    return False
+
+def backoff_delay(attempt, base=BASE_DELAY_S, cap=MAX_DELAY_S, rng=random):
+    # "Full jitter": uniform in [0, min(cap, base * 2^attempt)]
+    return rng.uniform(0.0, min(cap, base * (2 ** attempt)))
+
+
+# ============================
+# Fetch
+# ============================
+def fetch_events(service, calendar_id, time_min_utc, time_max_utc, limiter=None, fields=EVENT_FIELDS,
+                 page_size=2500, page_token=None, max_retries=MAX_RETRIES, sleep=time.sleep, rng=random):
+    """
+    Fetch every event instance in the window, page by page. Returns (events, stats).
+
+    stats has one dict per page (latency_s, bytes, items, attempts, throttle_s). Pass page_token
+    from a CalendarFetchError to pick up where a failed run stopped.
+    """
+    if limiter is None:
+        limiter = TokenBucket(sleep=sleep)
+
+    events = []
+    stats = []
+    while True:
+        attempt = 0
+        throttle = 0.0
+        while True:
+            throttle += limiter.acquire()
+            t0 = time.perf_counter()
+            try:
+                resp = service.events().list(
+                    calendarId=calendar_id,
+                    timeMin=time_min_utc,
+                    timeMax=time_max_utc,
+                    singleEvents=True,      # expands recurring events into instances
+                    showDeleted=True,       # lets you see cancellations (status='cancelled')
+                    maxResults=page_size,
+                    pageToken=page_token,
+                    fields=fields,
+                ).execute()
+                break
+            except Exception as e:
+                if not is_retryable(e) or attempt >= max_retries:
+                    raise CalendarFetchError(calendar_id, page_token, events, stats, e) from e
+                delay = backoff_delay(attempt, rng=rng)
+                print(f"{calendar_id}: {e!r}; retry {attempt + 1}/{max_retries} in {delay:.1f}s")
+                sleep(delay)
+                attempt += 1
+
+        items = resp.get("items", [])
+        stats.append({
+            "page": len(stats),
+            "latency_s": time.perf_counter() - t0,
+            "bytes": len(json.dumps(resp, separators=(",", ":"))),   # decoded payload size (approx. wire bytes)
+            "items": len(items),
+            "attempts": attempt + 1,
+            "throttle_s": throttle,
+        })
+        events.extend(items)
+
+        page_token = resp.get("nextPageToken")
+        if not page_token:
+            break
+
+    return events, stats
+
+def summarize_fetch_stats(stats):
+    n = len(stats)
+    if not n:
+        return "0 pages"
+    latency = sum(s["latency_s"] for s in stats)
+    nbytes = sum(s["bytes"] for s in stats)
+    items = sum(s["items"] for s in stats)
+    retries = sum(s["attempts"] - 1 for s in stats)
+    throttle = sum(s["throttle_s"] for s in stats)
+    return (f"{n} pages, {items:,} events, {nbytes / 1e6:.2f} MB, "
+            f"{latency:.2f}s in requests (max page {max(s['latency_s'] for s in stats):.2f}s), "
+            f"{retries} retries, {throttle:.2f}s throttled")
@@ -0,0 +1,19 @@
+# ============================
+# Shared PostgreSQL connection (used by every pipeline stage)
+# ============================
+import os
+
+DB_HOST = "localhost"
+DB_PORT = 5432 #default port for Postgres
+DB_NAME = "lab_analytics"
+DB_USER = "postgres"
+DB_PASSWORD = os.environ.get("LAB_DB_PASSWORD", "***") # <-- CHANGE ME (or set LAB_DB_PASSWORD)
+
+
+def get_conn(dbname=None, **kwargs):
+    # dbname overrides DB_NAME (e.g. the benchmark database); extra kwargs go to psycopg2.connect
+    import psycopg2                               #Postgres database access (imported on first use)
+
+    return psycopg2.connect(
+        host=DB_HOST, port=DB_PORT, dbname=dbname or DB_NAME, user=DB_USER, password=DB_PASSWORD, **kwargs
+    )
@@ -0,0 +1,218 @@
+"""
+Instrument occupancy from raw_events_deid: booking conflicts, idle gaps, hourly utilization and the
+booking queue each request joined.
+
+Every calendar (instrument) is handled with sorted arrays: overlap counts and queue depths are
+searchsorted look-ups, busy time is a merge of the sorted intervals, and hourly utilization is read
+off the cumulative busy-time curve. Everything is O(n log n) per calendar, with no SQL self-joins.
+"""
+
+import numpy as np
+import pandas as pd
+
+from DiD_panel import epoch_seconds
+
+BOOKINGS_QUERY = """
+SELECT source_event_id_hash, calendar_id_hash, start_ts, end_ts, created_ts, all_day
+FROM raw_events_deid
+WHERE status ILIKE 'confirmed'
+"""
+
+DDL = """
+CREATE TABLE IF NOT EXISTS booking_occupancy (
+  source_event_id_hash TEXT PRIMARY KEY,
+  calendar_id_hash TEXT NOT NULL,
+  n_overlaps INT NOT NULL,
+  lead_time_hr DOUBLE PRECISION,
+  queue_depth INT
+);
+
+CREATE TABLE IF NOT EXISTS instrument_hourly_util (
+  calendar_id_hash TEXT NOT NULL,
+  hour_start TIMESTAMPTZ NOT NULL,
+  booked_frac REAL NOT NULL,
+  PRIMARY KEY (calendar_id_hash, hour_start)
+);
+
+CREATE TABLE IF NOT EXISTS instrument_idle_gaps (
+  calendar_id_hash TEXT NOT NULL,
+  gap_start TIMESTAMPTZ NOT NULL,
+  gap_end TIMESTAMPTZ NOT NULL,
+  gap_hr DOUBLE PRECISION NOT NULL,
+  PRIMARY KEY (calendar_id_hash, gap_start)
+);
+"""
+
+HOUR = 3600
+
+
+# ============================
+# Interval primitives (sorted int64 seconds)
+# ============================
+def overlap_counts(start, end):
+    # For each booking, how many *other* bookings overlap it: #(s_j < e_i) - #(e_j <= s_i) - 1
+    s_sorted = np.sort(start)
+    e_sorted = np.sort(end)
+    return np.searchsorted(s_sorted, end, side="left") - np.searchsorted(e_sorted, start, side="right") - 1
+
+def max_concurrency(start, end):
+    # Sweep line; at equal times ends are processed before starts (back-to-back is not a conflict)
+    t = np.concatenate([end, start])
+    delta = np.concatenate([-np.ones(len(end), np.int64), np.ones(len(start), np.int64)])
+    order = np.lexsort((delta, t))
+    return int(np.cumsum(delta[order]).max()) if len(t) else 0
+
+def merge_intervals(start, end):
+    # Union of intervals as disjoint busy blocks; input must be sorted by start
+    if len(start) == 0:
+        return start, end
+    run_end = np.maximum.accumulate(end)
+    new_block = np.empty(len(start), bool)
+    new_block[0] = True
+    new_block[1:] = start[1:] > run_end[:-1]
+    first = np.flatnonzero(new_block)
+    last = np.append(first[1:], len(start)) - 1
+    return start[first], run_end[last]
+
+def busy_time_before(block_start, block_end, t):
+    # Total busy seconds in (-inf, t) for each t, from prefix sums over the merged blocks
+    lengths = block_end - block_start
+    cum = np.concatenate([[0], np.cumsum(lengths)])
+    k = np.searchsorted(block_start, t, side="right")           # blocks that started before t
+    prev = np.maximum(k - 1, 0)
+    partial = np.clip(t - block_start[prev], 0, lengths[prev])
+    return np.where(k > 0, cum[prev] + partial, 0)
+
+def queue_depth(start, created):
+    # Bookings already on the calendar and not yet started when each booking was made:
+    # #(c_j <= c_i) - #(s_j <= c_i), minus the booking itself. Negative lead times are treated
+    # as made at start so every booking is on the calendar before it starts.
+    created = np.minimum(created, start)
+    c_sorted = np.sort(created)
+    s_sorted = np.sort(start)
+    pending = np.searchsorted(c_sorted, created, side="right") - np.searchsorted(s_sorted, created, side="right")
+    return pending - (start > created)
+
+
+# ============================
+# Per-calendar analytics
+# ============================
+def _timestamps(seconds):
+    return pd.to_datetime(seconds, unit="s", utc=True)
+
+def occupancy_tables(bookings, include_all_day=False):
+    """
+    Compute the occupancy tables from a raw_events_deid frame (BOOKINGS_QUERY columns).
+
+    Returns (per_booking, hourly, gaps, summary) DataFrames. Zero-length bookings and, by default,
+    all-day events are left out (an all-day block is not instrument time).
+    """
+    b = bookings
+    if not include_all_day:
+        b = b.loc[~b["all_day"].astype(bool)]
+    start = epoch_seconds(b["start_ts"])
+    end = epoch_seconds(b["end_ts"])
+    created = np.where(b["created_ts"].notna(), epoch_seconds(b["created_ts"].fillna(b["start_ts"])), start)
+
+    valid = end > start
+    b = b.loc[valid]
+    start, end, created = start[valid], end[valid], created[valid]
+
+    cal_codes, cal_names = pd.factorize(b["calendar_id_hash"])
+    order = np.lexsort((start, cal_codes))
+    bounds = np.searchsorted(cal_codes[order], np.arange(len(cal_names) + 1))
+
+    per_booking, hourly, gaps, summary = [], [], [], []
+    for c, cal in enumerate(cal_names):
+        idx = order[bounds[c]:bounds[c + 1]]
+        s, e, cr = start[idx], end[idx], created[idx]
+
+        overlaps = overlap_counts(s, e)
+        per_booking.append(pd.DataFrame({
+            "source_event_id_hash": b["source_event_id_hash"].to_numpy()[idx],
+            "calendar_id_hash": cal,
+            "n_overlaps": overlaps,
+            "lead_time_hr": (s - cr) / HOUR,
+            "queue_depth": queue_depth(s, cr),
+        }))
+
+        bs, be = merge_intervals(s, e)
+        gaps.append(pd.DataFrame({
+            "calendar_id_hash": cal,
+            "gap_start": _timestamps(be[:-1]),
+            "gap_end": _timestamps(bs[1:]),
+            "gap_hr": (bs[1:] - be[:-1]) / HOUR,
+        }))
+
+        hours = np.arange(bs[0] // HOUR * HOUR, -(-be[-1] // HOUR) * HOUR + 1, HOUR)
+        busy = np.diff(busy_time_before(bs, be, hours))
+        used = busy > 0
+        hourly.append(pd.DataFrame({
+            "calendar_id_hash": cal,
+            "hour_start": _timestamps(hours[:-1][used]),
+            "booked_frac": (busy[used] / HOUR).astype(np.float32),
+        }))
+
+        span = hours[-1] - hours[0]
+        summary.append({
+            "calendar_id_hash": cal,
+            "bookings": len(s),
+            "conflicting_bookings": int((overlaps > 0).sum()),
+            "max_concurrent": max_concurrency(s, e),
+            "utilization": float(busy.sum() / span) if span else np.nan,
+            "median_idle_gap_hr": float(np.median(bs[1:] - be[:-1]) / HOUR) if len(bs) > 1 else np.nan,
+            "median_lead_time_hr": float(np.median(s - cr) / HOUR),
+            "mean_queue_depth": float(per_booking[-1]["queue_depth"].mean()),
+        })
+
+    def _cat(frames, cols):
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=cols)
+
+    return (
+        _cat(per_booking, ["source_event_id_hash", "calendar_id_hash", "n_overlaps", "lead_time_hr", "queue_depth"]),
+        _cat(hourly, ["calendar_id_hash", "hour_start", "booked_frac"]),
+        _cat(gaps, ["calendar_id_hash", "gap_start", "gap_end", "gap_hr"]),
+        pd.DataFrame(summary),
+    )
+
+
+# ============================
+# Load / store (Postgres)
+# ============================
+def load_bookings(conn):
+    return pd.read_sql(BOOKINGS_QUERY, conn)
+
+def store_tables(conn, per_booking, hourly, gaps):
+    # Derived tables: replace their contents in one transaction
+    from psycopg2.extras import execute_values
+
+    tables = [
+        ("booking_occupancy", per_booking),
+        ("instrument_hourly_util", hourly),
+        ("instrument_idle_gaps", gaps),
+    ]
+    with conn.cursor() as cur:
+        cur.execute(DDL)
+        for name, frame in tables:
+            cur.execute(f"TRUNCATE {name}")
+            cols = ", ".join(frame.columns)
+            rows = [tuple(r) for r in frame.astype(object).where(frame.notna(), None).itertuples(index=False)]
+            execute_values(cur, f"INSERT INTO {name} ({cols}) VALUES %s", rows, page_size=5000)
+    conn.commit()
+    for name, frame in tables:
+        print(f"Wrote {len(frame):,} rows into {name}.")
+
+def main():
+    from lab_config import get_conn
+
+    conn = get_conn()
+    try:
+        bookings = load_bookings(conn)
+        per_booking, hourly, gaps, summary = occupancy_tables(bookings)
+        print(summary.to_string(index=False))
+        store_tables(conn, per_booking, hourly, gaps)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
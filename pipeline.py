@@ -0,0 +1,272 @@
+"""
+Single entry point for the lab analytics pipeline.
+
+    python pipeline.py                 # run every stage whose inputs changed
+    python pipeline.py modeling        # run modeling (and whatever it depends on)
+    python pipeline.py --force files   # ignore the cache for the named stages (all if none named)
+
+Stages form a DAG; stages whose dependencies are done run concurrently in threads (they are I/O
+bound). A stage is skipped when its input fingerprint matches the last successful run recorded in
+the cache file. Per-stage timings are printed at the end.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CACHE_FILE = os.path.join(HERE, ".pipeline_cache.json")
+
+# View definitions, in dependency order
+VIEW_SQL_FILES = ["Cal_SQL.sql", "Files_SQL.sql", "Join_Cal_and_Files.sql"]
+
+# The calendar can change without anything local changing; re-pull once it is this old
+CALENDAR_MAX_AGE_HOURS = 24
+
+
+# ============================
+# Fingerprints
+# ============================
+def _digest(*parts):
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(repr(p).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+def _source(*names):
+    out = []
+    for name in names:
+        with open(os.path.join(HERE, name), "rb") as f:
+            out.append(hashlib.sha256(f.read()).hexdigest())
+    return out
+
+def _query_digest(sql):
+    from lab_config import get_conn
+
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(sql)
+            return _digest(cur.fetchone())
+    finally:
+        conn.close()
+
+def _tree_digest(root):
+    # Directory mtimes change whenever files are created, removed or renamed inside them,
+    # so hashing directories only is far cheaper than the per-file stat the scan does.
+    h = hashlib.sha256()
+    for dirpath, dirnames, _ in os.walk(root):
+        dirnames.sort()
+        h.update(f"{dirpath}\0{os.stat(dirpath).st_mtime_ns}\0".encode("utf-8"))
+    return h.hexdigest()
+
+
+# ============================
+# Stages
+# ============================
+def fp_calendar(upstream):
+    import LabAnalyticsETL as etl
+    return _digest(etl.CALENDAR_IDS, etl.TIME_MIN_UTC, etl.TIME_MAX_UTC, _source("LabAnalyticsETL.py"))
+
+def run_calendar():
+    import LabAnalyticsETL as etl
+    etl.main()
+
+def out_calendar():
+    return _query_digest("""
+        SELECT count(*), md5(string_agg(source_event_id_hash || coalesce(updated_ts::text, ''), ',' ORDER BY source_event_id_hash))
+        FROM raw_events_deid
+    """)
+
+def fp_files(upstream):
+    import LabDataETL as scanner
+    return _digest(scanner.ROOT_DIR, scanner.TIME_OFFSET, scanner.YEAR_START, scanner.YEAR_END_EXCLUSIVE,
+                   scanner.TIMESTAMP_FIELD, scanner.BIN_MINUTES, _tree_digest(scanner.ROOT_DIR), _source("LabDataETL.py"))
+
+def run_files():
+    import LabDataETL as scanner
+    scanner.main()
+
+def out_files():
+    import LabDataETL as scanner
+    return _query_digest(f"""
+        SELECT count(*), md5(string_agg(mother_folder || day::text || file_count::text || coalesce(file_bins::text, ''), ',' ORDER BY mother_folder, day))
+        FROM {scanner.TABLE_NAME}
+    """)
+
+def fp_views(upstream):
+    return _digest(upstream, _source(*VIEW_SQL_FILES))
+
+def run_views():
+    from lab_config import get_conn
+
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            for name in VIEW_SQL_FILES:
+                with open(os.path.join(HERE, name), encoding="utf-8") as f:
+                    cur.execute(f.read())
+        conn.commit()
+    finally:
+        conn.close()
+
+def fp_modeling(upstream):
+    return _digest(upstream, _source("DiD_analysis.py", "DiD_fitting.py", "DiD_inference.py", "DiD_sweep.py", "DiD_panel.py"))
+
+def run_modeling():
+    import DiD_analysis
+    DiD_analysis.main(["--headless"])
+
+def fp_occupancy(upstream):
+    return _digest(upstream, _source("occupancy.py"))
+
+def run_occupancy():
+    import occupancy
+    occupancy.main()
+
+def fp_attribution(upstream):
+    return _digest(upstream, _source("booking_attribution.py"))
+
+def run_attribution():
+    import booking_attribution
+    booking_attribution.main()
+
+STAGES = {
+    "calendar": {"deps": [], "fingerprint": fp_calendar, "run": run_calendar, "output": out_calendar,
+                 "max_age_hours": CALENDAR_MAX_AGE_HOURS},
+    "files": {"deps": [], "fingerprint": fp_files, "run": run_files, "output": out_files},
+    "views": {"deps": ["calendar", "files"], "fingerprint": fp_views, "run": run_views},
+    "modeling": {"deps": ["views"], "fingerprint": fp_modeling, "run": run_modeling},
+    "occupancy": {"deps": ["calendar"], "fingerprint": fp_occupancy, "run": run_occupancy},
+    "attribution": {"deps": ["views"], "fingerprint": fp_attribution, "run": run_attribution},
+}
+
+
+# ============================
+# Cache
+# ============================
+def load_cache(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_cache(path, cache):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp, path)
+
+def _fresh(entry, fingerprint, max_age_hours):
+    if not entry or entry.get("fingerprint") != fingerprint:
+        return False
+    if max_age_hours is None:
+        return True
+    age = datetime.now(timezone.utc) - datetime.fromisoformat(entry["finished"])
+    return age.total_seconds() < max_age_hours * 3600
+
+
+# ============================
+# Scheduler
+# ============================
+def with_deps(targets):
+    # Targets plus everything they depend on, in definition order
+    needed = set()
+    stack = list(targets)
+    while stack:
+        name = stack.pop()
+        if name not in needed:
+            needed.add(name)
+            stack.extend(STAGES[name]["deps"])
+    return [name for name in STAGES if name in needed]
+
+def _run_stage(name, upstream, entry, force):
+    # Runs in a worker thread; never touches the cache dict, the new entry is returned instead
+    stage = STAGES[name]
+    t0 = time.perf_counter()
+    try:
+        fingerprint = stage["fingerprint"](upstream)
+        if not force and _fresh(entry, fingerprint, stage.get("max_age_hours")):
+            result = {"status": "cached", "output": entry["output"]}
+        else:
+            stage["run"]()
+            output = stage["output"]() if "output" in stage else fingerprint
+            result = {"status": "ran", "output": output,
+                      "entry": {"fingerprint": fingerprint, "output": output,
+                                "finished": datetime.now(timezone.utc).isoformat()}}
+    except Exception as e:
+        result = {"status": "failed", "error": repr(e)}
+    result["seconds"] = time.perf_counter() - t0            # failed stages keep their timing too
+    return result
+
+def run_pipeline(targets=None, force=(), max_workers=4, cache_file=CACHE_FILE, dry_run=False):
+    names = with_deps(targets or list(STAGES))
+    cache = load_cache(cache_file)
+    report = {}
+
+    if dry_run:
+        for name in names:
+            print(f"{name:<12} deps: {', '.join(STAGES[name]['deps']) or '-'}")
+        return report
+
+    pending = list(names)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            for name in list(pending):
+                deps = [d for d in STAGES[name]["deps"] if d in names]
+                if any(report.get(d, {}).get("status") in ("failed", "blocked") for d in deps):
+                    report[name] = {"status": "blocked", "seconds": 0.0}
+                    pending.remove(name)
+                elif all(d in report for d in deps):
+                    upstream = {d: report[d]["output"] for d in deps}
+                    print(f"--> {name}")
+                    running[pool.submit(_run_stage, name, upstream, cache.get(name), name in force)] = name
+                    pending.remove(name)
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                name = running.pop(fut)
+                report[name] = fut.result()
+                if "entry" in report[name]:
+                    cache[name] = report[name].pop("entry")     # only the main thread writes the cache
+                print(f"<-- {name}: {report[name]['status']}")
+                save_cache(cache_file, cache)
+
+    print("\nStage timings:")
+    for name in names:
+        r = report[name]
+        print(f"  {name:<12} {r['status']:<8} {r['seconds']:8.2f}s  {r.get('error', '')}")
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the lab analytics pipeline.")
+    parser.add_argument("stages", nargs="*", help=f"target stages (default: all): {', '.join(STAGES)}")
+    parser.add_argument("--force", nargs="*", default=None, help="ignore the cache for these stages (all if none given)")
+    parser.add_argument("--jobs", type=int, default=4, help="max stages running at once")
+    parser.add_argument("--cache", default=CACHE_FILE)
+    parser.add_argument("--dry-run", action="store_true", help="print the stages that would be considered")
+    args = parser.parse_args(argv)
+    unknown = [s for s in args.stages + (args.force or []) if s not in STAGES]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)}")
+
+    targets = args.stages or None
+    if args.force is None:
+        force = set()
+    else:
+        force = set(args.force) or set(STAGES)
+
+    report = run_pipeline(targets, force=force, max_workers=args.jobs, cache_file=args.cache, dry_run=args.dry_run)
+    if any(r["status"] in ("failed", "blocked") for r in report.values()):
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()